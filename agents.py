@@ -1,115 +1,529 @@
-from crewai import Agent
 from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.schema import BaseMessage
 from textwrap import dedent
 import os
+import re
+import json
 import time
 import asyncio
+import hashlib
 import logging
+import threading
+import functools
+import concurrent.futures
+from collections import OrderedDict
 from dotenv import load_dotenv
-from config import GeminiConfig
+from config import GeminiConfig, CircuitOpenError, LLMCancelledError, circuit_breaker, disk_cache, semantic_cache
 
 # Load environment variables
 load_dotenv()
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# The game instructions block of a task prompt (see tasks.py); the semantic
+# cache compares only this block and requires the rest to match exactly
+_INSTRUCTIONS_RE = re.compile(
+    r"Instructions[ \t]*\n[ \t]*-{12}[ \t]*\n(.*?)\n[ \t]*-{12}[ \t]*(?:\n|$)", re.DOTALL
+)
+
+# Static agent backstories, built once at import. Task prompts put static
+# text first and the game instructions last so request prefixes stay identical.
+SENIOR_ENGINEER_BACKSTORY = dedent("""
+    You are a Senior Software Engineer at a leading tech company.
+    Your expertise is in Python game development using Pygame.
+    You write clean, efficient, and working code that runs without errors.
+    You are mindful of API usage and write concise but complete solutions.
+""")
+
+QA_ENGINEER_BACKSTORY = dedent("""
+    You are a software engineer specialized in code quality assurance.
+    You have a keen eye for finding syntax errors, missing imports, 
+    logic issues, and security vulnerabilities in Python game code.
+    You focus on fixing only critical issues to maintain code efficiency.
+    You ensure the code is functional and secure.
+    You check the code with a single Code Review tool call, which covers
+    both syntax validation and the security scan, unless its report is
+    already part of your task.
+""")
+
+CHIEF_QA_ENGINEER_BACKSTORY = dedent("""
+    You are the Chief QA Engineer responsible for final code approval.
+    You ensure the game code is complete, functional, and meets all 
+    specified requirements. You make only essential changes to maintain
+    code quality while being efficient with resources.
+    Your final review ensures the game is ready to run.
+""")
+
+@functools.lru_cache(maxsize=None)
+def _lazy_agent_cls():
+    """Import crewai's Agent on first use; crewai is slow to import"""
+    from crewai import Agent
+    return Agent
+
+class _Flight:
+    """An in-flight LLM request whose outcome is shared with identical callers"""
+    
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+    
+    def outcome(self):
+        """Return the leader's result, or re-raise its error"""
+        if self.error is not None:
+            raise self.error
+        return self.result
+
 class ResilientChatGoogleGenerativeAI(ChatGoogleGenerativeAI):
     """
     A wrapper around ChatGoogleGenerativeAI that handles quota errors with retries
     """
     
+    # Exact-match response cache shared by all instances (key -> ChatResult)
+    _response_cache = OrderedDict()
+    _cache_lock = threading.Lock()
+    
+    # Requests currently being sent to the API (key -> _Flight)
+    _inflight = {}
+    _inflight_lock = threading.Lock()
+    
+    # Worker threads for hedged sync requests: a primary and a duplicate per crew run
+    _hedge_pool = concurrent.futures.ThreadPoolExecutor(
+        max_workers=2 * max(1, GeminiConfig.MAX_CONCURRENT), thread_name_prefix="llm-hedge"
+    )
+    
+    # Race a duplicate request when a call is slower than recent calls
+    hedged: bool = False
+    
+    def _request_key(self, messages, stop=None):
+        """Hash everything that determines the response to a request"""
+        payload = json.dumps({
+            "model": self.model,
+            "temperature": self.temperature,
+            "messages": [[m.type, m.content] for m in messages],
+            "stop": stop,
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def _cache_key(self, messages, stop=None):
+        """
+        Build the response cache key for a request
+        
+        Returns:
+            str: sha256 hex digest, or None if the request should not be cached
+        """
+        if self.temperature != 0 and not GeminiConfig.CACHE_NONDETERMINISTIC:
+            return None
+        return self._request_key(messages, stop)
+    
+    @classmethod
+    def _remember(cls, key, result):
+        """Add a result to the in-memory LRU, evicting the oldest entry when full"""
+        with cls._cache_lock:
+            cls._response_cache[key] = result
+            cls._response_cache.move_to_end(key)
+            while len(cls._response_cache) > GeminiConfig.RESPONSE_CACHE_SIZE:
+                cls._response_cache.popitem(last=False)
+    
+    @classmethod
+    def _cache_get(cls, key):
+        """Return the cached result for key from memory or disk, or None"""
+        if key is None:
+            return None
+        with cls._cache_lock:
+            result = cls._response_cache.get(key)
+            if result is not None:
+                cls._response_cache.move_to_end(key)
+                return result
+        
+        result = disk_cache.get(key)
+        if result is not None:
+            cls._remember(key, result)
+        return result
+    
+    @classmethod
+    def _cache_put(cls, key, result):
+        """Store a result in memory and write it through to the disk cache"""
+        if key is None:
+            return
+        cls._remember(key, result)
+        disk_cache.put(key, result)
+    
+    def _semantic_lookup(self, messages, cache_key):
+        """
+        Look up the request's game instructions in the semantic cache
+        
+        CrewAI sends each agent step as a single human message holding the
+        role, backstory, tools, task and scratchpad. Only the instructions
+        block is embedded; everything else is hashed into the scope, so a hit
+        requires the rest of the prompt to be byte-identical. The embedding
+        model is part of the scope because vectors from different models
+        cannot be compared.
+        
+        Returns:
+            tuple: (scope, embedding, cached result or None)
+        """
+        if cache_key is None or not GeminiConfig.SEMANTIC_CACHE_ENABLED:
+            return None, None, None
+        
+        human = [m for m in messages if m.type == "human"]
+        if not human:
+            return None, None, None
+        
+        prompt = str(human[-1].content)
+        match = _INSTRUCTIONS_RE.search(prompt)
+        if match is None:
+            return None, None, None
+        
+        remainder = prompt[:match.start(1)] + prompt[match.end(1):]
+        context = [[m.type, m.content] for m in messages if m is not human[-1]]
+        scope = hashlib.sha256(
+            json.dumps([self.model, self.temperature, GeminiConfig.SEMANTIC_MODEL, context, remainder], default=str).encode("utf-8")
+        ).hexdigest()
+        embedding = semantic_cache.embed(match.group(1).strip())
+        return scope, embedding, semantic_cache.get(scope, embedding)
+    
+    @classmethod
+    def _join_flight(cls, key):
+        """
+        Join the in-flight request for key, or register a new one
+        
+        Returns:
+            tuple: (_Flight, True if the caller must send the request itself)
+        """
+        with cls._inflight_lock:
+            flight = cls._inflight.get(key)
+            if flight is not None:
+                return flight, False
+            flight = cls._inflight[key] = _Flight()
+            return flight, True
+    
+    @classmethod
+    def _finish_flight(cls, key, flight):
+        """Publish the leader's outcome to waiting callers and unregister the flight"""
+        with cls._inflight_lock:
+            cls._inflight.pop(key, None)
+        flight.event.set()
+    
     def _generate(self, messages, stop=None, run_manager=None, **kwargs):
-        """Override the _generate method to add quota handling"""
+        """Override the _generate method to add caching and quota handling"""
+        cache_key = self._cache_key(messages, stop)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            logger.info("LLM response cache hit - skipping API call")
+            return cached
+        
+        scope, embedding, cached = self._semantic_lookup(messages, cache_key)
+        if cached is not None:
+            return cached
+        
+        # Identical concurrent requests share a single API call, but only when
+        # the response cache would reuse the answer too (sampled requests don't)
+        if cache_key is None:
+            return self._generate_with_retries(
+                messages, stop, run_manager, cache_key, scope, embedding, **kwargs
+            )
+        flight, is_leader = self._join_flight(cache_key)
+        if not is_leader:
+            logger.info("Identical LLM request already in flight - waiting for its result")
+            flight.event.wait()
+            return flight.outcome()
+        
+        try:
+            flight.result = self._generate_with_retries(
+                messages, stop, run_manager, cache_key, scope, embedding, **kwargs
+            )
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            self._finish_flight(cache_key, flight)
+    
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        """Override the async _agenerate method to add caching and quota handling"""
+        cache_key = self._cache_key(messages, stop)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            logger.info("Async LLM response cache hit - skipping API call")
+            return cached
+        
+        scope, embedding, cached = self._semantic_lookup(messages, cache_key)
+        if cached is not None:
+            return cached
+        
+        # Identical concurrent requests share a single API call, but only when
+        # the response cache would reuse the answer too (sampled requests don't)
+        if cache_key is None:
+            return await self._agenerate_with_retries(
+                messages, stop, run_manager, cache_key, scope, embedding, **kwargs
+            )
+        flight, is_leader = self._join_flight(cache_key)
+        if not is_leader:
+            logger.info("Identical async LLM request already in flight - waiting for its result")
+            # The leader may be a sync caller on another thread, so wait off-loop
+            await asyncio.get_running_loop().run_in_executor(None, flight.event.wait)
+            return flight.outcome()
+        
+        try:
+            flight.result = await self._agenerate_with_retries(
+                messages, stop, run_manager, cache_key, scope, embedding, **kwargs
+            )
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            self._finish_flight(cache_key, flight)
+    
+    def _estimate_request_tokens(self, messages):
+        """Estimate the tokens a request consumes: the prompt plus the maximum output"""
+        prompt = "\n".join(str(m.content) for m in messages)
+        max_output = getattr(self, "max_output_tokens", None) or GeminiConfig.MAX_TOKENS
+        return GeminiConfig.estimate_tokens(prompt) + max_output
+    
+    def _try_hedge_slot(self, request_tokens):
+        """Reserve rate limit budget for a hedged duplicate without waiting"""
+        return (GeminiConfig.get_rate_limiter(self.model).try_acquire() and
+                GeminiConfig.get_token_limiter(self.model).try_acquire(request_tokens))
+    
+    def _call_api(self, messages, stop, run_manager, hedge_delay, request_tokens, **kwargs):
+        """
+        Send one request to the API
+        
+        With a hedge delay, a duplicate request is sent if the first has not
+        answered in time (and the rate limits have room for it). The first
+        successful reply wins; the other request's result is discarded.
+        """
+        call = functools.partial(super()._generate, messages, stop=stop, run_manager=run_manager, **kwargs)
+        if hedge_delay is None:
+            return call()
+        
+        # Start the hedge timer once the primary is running, not while it is queued
+        started = threading.Event()
+        
+        def run_primary():
+            started.set()
+            return call()
+        
+        primary = self._hedge_pool.submit(run_primary)
+        started.wait()
+        done, _ = concurrent.futures.wait([primary], timeout=hedge_delay)
+        if done or not self._try_hedge_slot(request_tokens):
+            return primary.result()
+        
+        logger.info("LLM call slower than %.1fs - sending a hedged duplicate request", hedge_delay)
+        pending = {primary, self._hedge_pool.submit(call)}
+        errors = []
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    return future.result()
+                errors.append(future.exception())
+        raise errors[0]
+    
+    async def _acall_api(self, messages, stop, run_manager, hedge_delay, request_tokens, **kwargs):
+        """Asynchronously send one request to the API, hedging it like _call_api"""
+        if hedge_delay is None:
+            return await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        
+        call = functools.partial(super()._agenerate, messages, stop=stop, run_manager=run_manager, **kwargs)
+        primary = asyncio.ensure_future(call())
+        done, _ = await asyncio.wait({primary}, timeout=hedge_delay)
+        if done or not self._try_hedge_slot(request_tokens):
+            return await primary
+        
+        logger.info("Async LLM call slower than %.1fs - sending a hedged duplicate request", hedge_delay)
+        pending = {primary, asyncio.ensure_future(call())}
+        errors = []
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    return task.result()
+                errors.append(task.exception())
+        raise errors[0]
+    
+    def _generate_with_retries(self, messages, stop, run_manager, cache_key, scope, embedding, **kwargs):
+        """Call the API with quota handling and store the result in the caches"""
         max_attempts = GeminiConfig.MAX_QUOTA_RETRIES
         
+        # Size the request timeout from recently observed latencies
+        latency_tracker = GeminiConfig.get_latency_tracker(self.model)
+        timeout = latency_tracker.timeout()
+        request_tokens = self._estimate_request_tokens(messages)
+        hedge_delay = latency_tracker.hedge_delay() if self.hedged else None
+        
         for attempt in range(max_attempts):
+            if attempt > 0:
+                logger.info("Retrying LLM call (attempt %s/%s)", attempt + 1, max_attempts)
+            
+            # Stop once the user has interrupted the run
+            if GeminiConfig.waits_cancelled():
+                raise LLMCancelledError("LLM call cancelled by user")
+            
+            # Fail fast while the circuit breaker is open
+            circuit_breaker.before_call()
+            
             try:
-                # Add delay before each attempt
-                if attempt > 0:
-                    logger.info(f"Retrying LLM call (attempt {attempt + 1}/{max_attempts})")
-                    GeminiConfig.add_request_delay()
+                # Wait for a slot in the per-model request and token rate limits
+                if not (GeminiConfig.get_rate_limiter(self.model).acquire() and
+                        GeminiConfig.get_token_limiter(self.model).acquire(request_tokens)):
+                    raise LLMCancelledError("LLM call cancelled while waiting for a request slot")
                 
-                return super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+                start_time = time.monotonic()
+                # The deadline goes with this request only; the instance is shared
+                result = self._call_api(
+                    messages, stop, run_manager, hedge_delay, request_tokens, **{**kwargs, "timeout": timeout}
+                )
                 
+            except LLMCancelledError:
+                # Cancelled before the request was sent - not an API failure
+                circuit_breaker.release()
+                raise
             except Exception as e:
-                error_str = str(e).lower()
+                if GeminiConfig.is_timeout_error(e) and attempt < max_attempts - 1:
+                    # Slow but possibly alive - give the next attempt more time
+                    circuit_breaker.record_failure()
+                    if circuit_breaker.is_open:
+                        raise CircuitOpenError(f"Circuit breaker opened after repeated failures: {e}") from e
+                    timeout = min(timeout * GeminiConfig.TIMEOUT_ESCALATION, GeminiConfig.MAX_TIMEOUT)
+                    logger.warning("LLM call timed out on attempt %s, retrying with %.0fs timeout", attempt + 1, timeout)
+                    continue
                 
-                # Check for various rate limit and quota error patterns
-                if (GeminiConfig.is_quota_error(e) or 
-                    'rate limit' in error_str or 
-                    'quota' in error_str or
-                    'too many requests' in error_str or
-                    '429' in error_str or
-                    'resource_exhausted' in error_str):
+                if GeminiConfig.is_quota_error(e):
+                    logger.warning("Rate limit/quota error on attempt %s: %s", attempt + 1, e)
+                    circuit_breaker.record_failure()
                     
-                    logger.warning(f"Rate limit/quota error on attempt {attempt + 1}: {e}")
+                    if circuit_breaker.is_open:
+                        raise CircuitOpenError(f"Circuit breaker opened after repeated rate limit errors: {e}") from e
                     
                     if attempt < max_attempts - 1:  # Not the last attempt
-                        # Wait 60 seconds for rate limit recovery
-                        wait_time = 60 + (attempt * 30)  # Increasing wait time
-                        logger.info(f"Rate limit detected - waiting {wait_time} seconds before retry...")
-                        time.sleep(wait_time)
+                        wait_time = GeminiConfig.get_retry_delay(e, attempt)
+                        logger.info("Rate limit detected - waiting %.1f seconds before retry...", wait_time)
+                        if not GeminiConfig.wait(wait_time):
+                            raise LLMCancelledError("LLM call cancelled while waiting to retry") from e
                         continue
                     else:
                         logger.error("LLM: Maximum rate limit retries exceeded")
                         raise Exception(f"Rate limit exceeded after {max_attempts} attempts. Please wait and try again.")
                 else:
                     # Non-quota error, re-raise immediately
-                    logger.error(f"LLM non-quota error: {e}")
+                    if GeminiConfig.is_server_error(e):
+                        circuit_breaker.record_failure()
+                    else:
+                        circuit_breaker.release()
+                    logger.error("LLM non-quota error: %s", e)
                     raise e
+            except BaseException:
+                # Cancelled or interrupted - free the half-open probe slot
+                circuit_breaker.release()
+                raise
+            
+            latency_tracker.record(time.monotonic() - start_time)
+            circuit_breaker.record_success()
+            self._cache_put(cache_key, result)
+            semantic_cache.put(scope, embedding, result)
+            return result
         
         # If we get here, all attempts failed
         raise Exception("LLM: All rate limit retry attempts failed")
     
-    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
-        """Override the async _agenerate method to add quota handling"""
+    async def _agenerate_with_retries(self, messages, stop, run_manager, cache_key, scope, embedding, **kwargs):
+        """Asynchronously call the API with quota handling and store the result in the caches"""
         max_attempts = GeminiConfig.MAX_QUOTA_RETRIES
         
+        # Size the request timeout from recently observed latencies
+        latency_tracker = GeminiConfig.get_latency_tracker(self.model)
+        timeout = latency_tracker.timeout()
+        request_tokens = self._estimate_request_tokens(messages)
+        hedge_delay = latency_tracker.hedge_delay() if self.hedged else None
+        
         for attempt in range(max_attempts):
+            if attempt > 0:
+                logger.info("Retrying async LLM call (attempt %s/%s)", attempt + 1, max_attempts)
+            
+            # Stop once the user has interrupted the run
+            if GeminiConfig.waits_cancelled():
+                raise LLMCancelledError("LLM call cancelled by user")
+            
+            # Fail fast while the circuit breaker is open
+            circuit_breaker.before_call()
+            
             try:
-                # Add delay before each attempt
-                if attempt > 0:
-                    logger.info(f"Retrying async LLM call (attempt {attempt + 1}/{max_attempts})")
-                    await asyncio.sleep(GeminiConfig.REQUEST_DELAY)
+                # Wait for a slot in the per-model request and token rate limits
+                if not (await GeminiConfig.get_rate_limiter(self.model).acquire_async() and
+                        await GeminiConfig.get_token_limiter(self.model).acquire_async(request_tokens)):
+                    raise LLMCancelledError("LLM call cancelled while waiting for a request slot")
                 
-                return await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+                start_time = time.monotonic()
+                # The deadline goes with this request only; the instance is shared
+                result = await self._acall_api(
+                    messages, stop, run_manager, hedge_delay, request_tokens, **{**kwargs, "timeout": timeout}
+                )
                 
+            except LLMCancelledError:
+                # Cancelled before the request was sent - not an API failure
+                circuit_breaker.release()
+                raise
             except Exception as e:
-                error_str = str(e).lower()
+                if GeminiConfig.is_timeout_error(e) and attempt < max_attempts - 1:
+                    # Slow but possibly alive - give the next attempt more time
+                    circuit_breaker.record_failure()
+                    if circuit_breaker.is_open:
+                        raise CircuitOpenError(f"Circuit breaker opened after repeated failures: {e}") from e
+                    timeout = min(timeout * GeminiConfig.TIMEOUT_ESCALATION, GeminiConfig.MAX_TIMEOUT)
+                    logger.warning("Async LLM call timed out on attempt %s, retrying with %.0fs timeout", attempt + 1, timeout)
+                    continue
                 
-                # Check for various rate limit and quota error patterns
-                if (GeminiConfig.is_quota_error(e) or 
-                    'rate limit' in error_str or 
-                    'quota' in error_str or
-                    'too many requests' in error_str or
-                    '429' in error_str or
-                    'resource_exhausted' in error_str):
+                if GeminiConfig.is_quota_error(e):
+                    logger.warning("Async rate limit/quota error on attempt %s: %s", attempt + 1, e)
+                    circuit_breaker.record_failure()
                     
-                    logger.warning(f"Async rate limit/quota error on attempt {attempt + 1}: {e}")
+                    if circuit_breaker.is_open:
+                        raise CircuitOpenError(f"Circuit breaker opened after repeated rate limit errors: {e}") from e
                     
                     if attempt < max_attempts - 1:  # Not the last attempt
-                        # Wait 60 seconds for rate limit recovery
-                        wait_time = 60 + (attempt * 30)  # Increasing wait time
-                        logger.info(f"Async rate limit detected - waiting {wait_time} seconds before retry...")
-                        await asyncio.sleep(wait_time)
+                        wait_time = GeminiConfig.get_retry_delay(e, attempt)
+                        logger.info("Async rate limit detected - waiting %.1f seconds before retry...", wait_time)
+                        if not await GeminiConfig.wait_async(wait_time):
+                            raise LLMCancelledError("Async LLM call cancelled while waiting to retry") from e
                         continue
                     else:
                         logger.error("Async LLM: Maximum rate limit retries exceeded")
                         raise Exception(f"Rate limit exceeded after {max_attempts} attempts. Please wait and try again.")
                 else:
                     # Non-quota error, re-raise immediately
-                    logger.error(f"Async LLM non-quota error: {e}")
+                    if GeminiConfig.is_server_error(e):
+                        circuit_breaker.record_failure()
+                    else:
+                        circuit_breaker.release()
+                    logger.error("Async LLM non-quota error: %s", e)
                     raise e
+            except BaseException:
+                # Cancelled or interrupted - free the half-open probe slot
+                circuit_breaker.release()
+                raise
+            
+            latency_tracker.record(time.monotonic() - start_time)
+            circuit_breaker.record_success()
+            self._cache_put(cache_key, result)
+            semantic_cache.put(scope, embedding, result)
+            return result
         
         # If we get here, all attempts failed
         raise Exception("Async LLM: All rate limit retry attempts failed")
 
-def create_resilient_llm():
+def create_resilient_llm(hedged=False):
     """
     Create a Gemini LLM with quota handling wrapper
+    
+    Args:
+        hedged: Race a duplicate request when a call is slower than usual
     """
     try:
         llm = ResilientChatGoogleGenerativeAI(
@@ -118,82 +532,101 @@ def create_resilient_llm():
             google_api_key=os.getenv("GOOGLE_API_KEY"),
             max_tokens=2048,
             request_timeout=90,  # Increased timeout
-            max_retries=2,  # Reduced retries (we handle this at higher level)
+            max_retries=0,  # Retries are handled by ResilientChatGoogleGenerativeAI only
             retry_delay=3,
+            hedged=hedged,
         )
         
         logger.info("Successfully created resilient Gemini LLM")
         return llm
         
     except Exception as e:
-        logger.error(f"Failed to create resilient LLM: {e}")
+        logger.error("Failed to create resilient LLM: %s", e)
         raise e
 
+# Shared fallback LLM, created on first use
+_FALLBACK_LLM = None
+_fallback_llm_lock = threading.Lock()
+
+def _get_fallback_llm():
+    """
+    Get the fallback Gemini LLM with more conservative settings
+    """
+    global _FALLBACK_LLM
+    with _fallback_llm_lock:
+        if _FALLBACK_LLM is None:
+            _FALLBACK_LLM = ChatGoogleGenerativeAI(
+                model="gemini-1.5-flash",
+                temperature=0.5,  # Lower temperature
+                google_api_key=os.getenv("GOOGLE_API_KEY"),
+                max_tokens=1024,  # Reduced tokens
+                request_timeout=60,
+                max_retries=1,
+                retry_delay=5,
+            )
+        return _FALLBACK_LLM
+
 class GameBuilderAgents:
     def __init__(self):
         # Initialize Resilient Gemini LLM with enhanced configuration
         try:
             self.llm = create_resilient_llm()
+            # Code generation is the longest call, so only it is hedged
+            self.code_llm = create_resilient_llm(hedged=True) if GeminiConfig.HEDGE_ENABLED else self.llm
             logger.info("Successfully initialized Gemini LLM with quota handling")
         except Exception as e:
-            logger.error(f"Failed to initialize LLM: {e}")
+            logger.error("Failed to initialize LLM: %s", e)
             raise e
+        
+        # Agents are built on first use and reused across crew runs and retries
+        self._senior = None
+        self._qa = None
+        self._chief = None
     
     def senior_engineer_agent(self):
-        return Agent(
-            role="Senior Software Engineer",
-            goal="Create high-quality, functional game code efficiently",
-            backstory=dedent("""
-                You are a Senior Software Engineer at a leading tech company.
-                Your expertise is in Python game development using Pygame.
-                You write clean, efficient, and working code that runs without errors.
-                You are mindful of API usage and write concise but complete solutions.
-            """),
-            llm=self.llm,
-            allow_delegation=False,
-            verbose=True,
-            max_iter=5,  # Increased iterations to handle rate limits
-            memory=True,
-            max_execution_time=900,  # 15 minutes max per task
-        )
+        if self._senior is None:
+            self._senior = _lazy_agent_cls()(
+                role="Senior Software Engineer",
+                goal="Create high-quality, functional game code efficiently",
+                backstory=SENIOR_ENGINEER_BACKSTORY,
+                llm=self.code_llm,
+                allow_delegation=False,
+                verbose=True,
+                max_iter=5,  # Increased iterations to handle rate limits
+                memory=True,
+                max_execution_time=900,  # 15 minutes max per task
+            )
+        return self._senior
     
     def qa_engineer_agent(self):
-        return Agent(
-            role="Software Quality Control Engineer",
-            goal="Identify and fix critical errors in game code efficiently",
-            backstory=dedent("""
-                You are a software engineer specialized in code quality assurance.
-                You have a keen eye for finding syntax errors, missing imports, 
-                logic issues, and security vulnerabilities in Python game code.
-                You focus on fixing only critical issues to maintain code efficiency.
-                You ensure the code is functional and secure.
-            """),
-            llm=self.llm,
-            allow_delegation=False,
-            verbose=True,
-            max_iter=5,  # Increased iterations to handle rate limits
-            memory=True,
-            max_execution_time=900,  # 15 minutes max per task
-        )
+        if self._qa is None:
+            self._qa = _lazy_agent_cls()(
+                role="Software Quality Control Engineer",
+                goal="Identify and fix critical errors in game code efficiently",
+                backstory=QA_ENGINEER_BACKSTORY,
+                llm=self.llm,
+                allow_delegation=False,
+                verbose=True,
+                max_iter=5,  # Increased iterations to handle rate limits
+                memory=True,
+                max_execution_time=900,  # 15 minutes max per task
+            )
+        return self._qa
     
     def chief_qa_engineer_agent(self):
-        return Agent(
-            role="Chief Software Quality Control Engineer",
-            goal="Ensure final code meets all requirements and is production-ready",
-            backstory=dedent("""
-                You are the Chief QA Engineer responsible for final code approval.
-                You ensure the game code is complete, functional, and meets all 
-                specified requirements. You make only essential changes to maintain
-                code quality while being efficient with resources.
-                Your final review ensures the game is ready to run.
-            """),
-            llm=self.llm,
-            allow_delegation=True,
-            verbose=True,
-            max_iter=5,  # Increased iterations to handle rate limits
-            memory=True,
-            max_execution_time=900,  # 15 minutes max per task
-        )
+        if self._chief is None:
+            self._chief = _lazy_agent_cls()(
+                role="Chief Software Quality Control Engineer",
+                goal="Ensure final code meets all requirements and is production-ready",
+                backstory=CHIEF_QA_ENGINEER_BACKSTORY,
+                llm=self.llm,
+                allow_delegation=True,
+                verbose=True,
+                max_iter=5,  # Increased iterations to handle rate limits
+                memory=True,
+                max_execution_time=900,  # 15 minutes max per task
+            )
+        return self._chief
     
     def get_agent_with_fallback(self, agent_type):
         """
@@ -210,27 +643,16 @@ class GameBuilderAgents:
                 raise ValueError(f"Unknown agent type: {agent_type}")
                 
         except Exception as e:
-            logger.warning(f"Failed to create {agent_type} agent: {e}")
+            logger.warning("Failed to create %s agent: %s", agent_type, e)
             logger.info("Attempting to create agent with fallback configuration...")
             
             try:
-                # Create fallback LLM with more conservative settings
-                fallback_llm = ChatGoogleGenerativeAI(
-                    model="gemini-1.5-flash",
-                    temperature=0.5,  # Lower temperature
-                    google_api_key=os.getenv("GOOGLE_API_KEY"),
-                    max_tokens=1024,  # Reduced tokens
-                    request_timeout=60,
-                    max_retries=1,
-                    retry_delay=5,
-                )
-                
                 # Create a basic agent with fallback settings
-                return Agent(
+                return _lazy_agent_cls()(
                     role="Fallback Game Developer",
                     goal="Create working game code with minimal resource usage",
                     backstory="You are a reliable game developer focused on creating functional code efficiently.",
-                    llm=fallback_llm,
+                    llm=_get_fallback_llm(),
                     allow_delegation=False,
                     verbose=False,  # Reduced verbosity
                     max_iter=1,  # Single iteration
@@ -239,5 +661,5 @@ class GameBuilderAgents:
                 )
                 
             except Exception as fallback_error:
-                logger.error(f"Fallback agent creation also failed: {fallback_error}")
+                logger.error("Fallback agent creation also failed: %s", fallback_error)
                 raise Exception(f"Could not create {agent_type} agent: {e}, Fallback also failed: {fallback_error}")
\ No newline at end of file
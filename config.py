@@ -1,13 +1,21 @@
 import os
+import re
+import json
 import time
+import random
+import pickle
+import sqlite3
+import hashlib
 import logging
+import asyncio
+import functools
+import threading
+import numpy as np
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class GeminiConfig:
@@ -28,12 +36,71 @@ class GeminiConfig:
     REQUEST_DELAY = float(os.getenv("REQUEST_DELAY", "3.0"))  # Increased from 2.0
     MAX_RETRIES = int(os.getenv("MAX_RETRIES", "5"))  # Increased retries
     RETRY_DELAY = float(os.getenv("RETRY_DELAY", "5.0"))
+    REQUESTS_PER_MINUTE = int(os.getenv("REQUESTS_PER_MINUTE", "3"))  # Token bucket rate and burst size
+    TOKENS_PER_MINUTE = int(os.getenv("TOKENS_PER_MINUTE", "250000"))  # Token budget per model
+    MAX_CONCURRENT = int(os.getenv("MAX_CONCURRENT", "3"))  # Crew runs in flight at once
+    # Hedged code generation: duplicate a slow request and keep the first reply
+    HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "false").lower() == "true"
+    HEDGE_DELAY = float(os.getenv("HEDGE_DELAY", str(REQUEST_DELAY / 2)))  # Minimum wait before hedging
+    # Training iterations generated per LLM request (1 runs the full crew each time)
+    TRAIN_BATCH_SIZE = int(os.getenv("TRAIN_BATCH_SIZE", "1"))
+    # Run the review and evaluation tasks concurrently on the generated code
+    PARALLEL_REVIEW = os.getenv("PARALLEL_REVIEW", "false").lower() == "true"
     
     # Quota restoration settings
     QUOTA_WAIT_TIME = 65  # Wait 65 seconds for quota to restore (1 minute + buffer)
     MAX_QUOTA_RETRIES = 10  # Maximum number of quota restoration attempts
     EXPONENTIAL_BACKOFF_BASE = 2
     MAX_BACKOFF_TIME = 300  # Max 5 minutes backoff
+    PROGRESS_UPDATE_INTERVAL = 5  # Seconds between progress bar updates
+    
+    # Adaptive request timeout settings
+    DEFAULT_TIMEOUT = 90  # Used until enough latencies have been observed
+    MIN_TIMEOUT = 30
+    MAX_TIMEOUT = 180
+    TIMEOUT_ESCALATION = 1.5  # Timeout multiplier after a timed out attempt
+    LATENCY_WINDOW = 100  # Number of recent call durations kept per model
+    
+    # Circuit breaker settings
+    CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+    CIRCUIT_RECOVERY_TIMEOUT = float(os.getenv("CIRCUIT_RECOVERY_TIMEOUT", "60"))
+    
+    # Response cache settings
+    RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+    # Only temperature 0 calls are cached unless this is enabled
+    CACHE_NONDETERMINISTIC = os.getenv("CACHE_NONDETERMINISTIC", "false").lower() == "true"
+    # Reuse finished crew results for instructions that were already built
+    RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+    
+    # Semantic cache settings (requires the optional sentence-transformers package)
+    SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+    SEMANTIC_MODEL = os.getenv("SEMANTIC_MODEL", "all-MiniLM-L6-v2")
+    SEMANTIC_THRESHOLD = float(os.getenv("SEMANTIC_THRESHOLD", "0.92"))
+    SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "256"))
+    SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "86400"))  # 24 hours
+    
+    # Persistent (SQLite) cache settings
+    DISK_CACHE_ENABLED = os.getenv("DISK_CACHE_ENABLED", "true").lower() == "true"
+    DISK_CACHE_PATH = os.getenv("DISK_CACHE_PATH", ".llm_cache.db")
+    DISK_CACHE_TTL = float(os.getenv("DISK_CACHE_TTL", "604800"))  # 7 days
+    
+    # Error classification patterns (matched case-insensitively against str(error))
+    _QUOTA_RE = re.compile(
+        r'429|rate[_ ]?limit|quota|resource[_ ]?exhausted|resource has been exhausted|too many requests',
+        re.IGNORECASE
+    )
+    _SERVER_ERROR_RE = re.compile(
+        r'\b50[0234]\b|internal error|service unavailable|deadline exceeded',
+        re.IGNORECASE
+    )
+    _TIMEOUT_RE = re.compile(r'timed? ?out|deadline exceeded', re.IGNORECASE)
+    _RETRY_AFTER_RE = re.compile(
+        r'retry (?:in|after) (\d+(?:\.\d+)?) ?s|retry_delay\s*\{\s*seconds:\s*(\d+)',
+        re.IGNORECASE
+    )
+    
+    # Set to abort quota waits early
+    _cancel_event = threading.Event()
     
     @classmethod
     def validate_config(cls):
@@ -58,10 +125,51 @@ class GeminiConfig:
         }
     
     @classmethod
-    def add_request_delay(cls):
-        """Add delay between requests to respect rate limits"""
-        logger.info(f"Adding request delay of {cls.REQUEST_DELAY} seconds")
-        time.sleep(cls.REQUEST_DELAY)
+    def get_rate_limiter(cls, model=None):
+        """
+        Get the shared request token bucket for a model
+        
+        Args:
+            model: Model name (defaults to DEFAULT_MODEL)
+            
+        Returns:
+            TokenBucket: Limiter sized to REQUESTS_PER_MINUTE
+        """
+        model = model or cls.DEFAULT_MODEL
+        with _rate_limiters_lock:
+            if model not in _rate_limiters:
+                _rate_limiters[model] = TokenBucket.per_minute(cls.REQUESTS_PER_MINUTE)
+            return _rate_limiters[model]
+    
+    @classmethod
+    def get_token_limiter(cls, model=None):
+        """
+        Get the shared tokens-per-minute bucket for a model
+        
+        Args:
+            model: Model name (defaults to DEFAULT_MODEL)
+            
+        Returns:
+            TokenBucket: Limiter sized to TOKENS_PER_MINUTE
+        """
+        model = model or cls.DEFAULT_MODEL
+        with _rate_limiters_lock:
+            if model not in _token_limiters:
+                _token_limiters[model] = TokenBucket.per_minute(cls.TOKENS_PER_MINUTE)
+            return _token_limiters[model]
+    
+    @classmethod
+    def estimate_tokens(cls, text):
+        """
+        Estimate the number of tokens in text
+        
+        Uses tiktoken's cl100k_base encoding as an approximation of Gemini's
+        tokenizer, or about four characters per token if it is unavailable.
+        """
+        encoding = _get_token_encoding()
+        if encoding is None:
+            return len(text) // 4 + 1
+        return len(encoding.encode(text, disallowed_special=()))
     
     @classmethod
     def handle_quota_exceeded(cls, retry_count=0):
@@ -75,7 +183,7 @@ class GeminiConfig:
             bool: True if should retry, False if max retries exceeded
         """
         if retry_count >= cls.MAX_QUOTA_RETRIES:
-            logger.error(f"Maximum quota retry attempts ({cls.MAX_QUOTA_RETRIES}) exceeded")
+            logger.error("Maximum quota retry attempts (%s) exceeded", cls.MAX_QUOTA_RETRIES)
             return False
         
         # Calculate wait time with exponential backoff
@@ -83,35 +191,86 @@ class GeminiConfig:
         exponential_factor = min(cls.EXPONENTIAL_BACKOFF_BASE ** retry_count, cls.MAX_BACKOFF_TIME / base_wait)
         wait_time = min(base_wait * exponential_factor, cls.MAX_BACKOFF_TIME)
         
-        logger.warning(f"Quota exceeded! Attempt {retry_count + 1}/{cls.MAX_QUOTA_RETRIES}")
-        logger.info(f"Waiting {wait_time:.1f} seconds for quota restoration...")
+        logger.warning("Quota exceeded! Attempt %s/%s", retry_count + 1, cls.MAX_QUOTA_RETRIES)
+        logger.info("Waiting %.1f seconds for quota restoration...", wait_time)
         
         # Show progress during wait
-        cls._show_wait_progress(wait_time)
+        return cls._show_wait_progress(wait_time)
+    
+    @classmethod
+    def cancel_waits(cls):
+        """Abort any in-progress quota or retry wait (e.g. from a SIGINT handler)"""
+        cls._cancel_event.set()
+    
+    @classmethod
+    def waits_cancelled(cls):
+        """Return True once cancel_waits() has been called"""
+        return cls._cancel_event.is_set()
+    
+    @classmethod
+    def wait(cls, seconds):
+        """
+        Sleep for the given time unless waits are cancelled
         
-        return True
+        Returns:
+            bool: True if the full time elapsed, False if cancelled
+        """
+        return not cls._cancel_event.wait(seconds)
+    
+    @classmethod
+    async def wait_async(cls, seconds):
+        """
+        Asynchronously sleep for the given time unless waits are cancelled
+        
+        Returns:
+            bool: True if the full time elapsed, False if cancelled
+        """
+        deadline = time.monotonic() + seconds
+        while not cls._cancel_event.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return True
+            await asyncio.sleep(min(remaining, 1))
+        return False
     
     @classmethod
     def _show_wait_progress(cls, wait_time):
-        """Show progress bar during wait time"""
+        """
+        Show progress bar during wait time
+        
+        Returns:
+            bool: True if the wait completed, False if it was cancelled
+        """
         import sys
         
-        total_seconds = int(wait_time)
-        for remaining in range(total_seconds, 0, -1):
-            mins, secs = divmod(remaining, 60)
+        deadline = time.monotonic() + wait_time
+        bar_length = 30
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            
+            mins, secs = divmod(int(remaining), 60)
             timer = f"{mins:02d}:{secs:02d}"
-            progress = (total_seconds - remaining) / total_seconds * 100
-            bar_length = 30
+            progress = (wait_time - remaining) / wait_time * 100
             filled_length = int(bar_length * progress // 100)
             bar = '█' * filled_length + '-' * (bar_length - filled_length)
             
             sys.stdout.write(f'\rWaiting for quota restoration: [{bar}] {progress:.1f}% - {timer}')
             sys.stdout.flush()
-            time.sleep(1)
+            
+            # Refresh every few seconds; wake immediately if cancelled
+            if cls._cancel_event.wait(min(remaining, cls.PROGRESS_UPDATE_INTERVAL)):
+                break
         
         sys.stdout.write('\r' + ' ' * 80 + '\r')  # Clear the line
         sys.stdout.flush()
+        
+        if cls._cancel_event.is_set():
+            logger.info("Quota wait cancelled.")
+            return False
         logger.info("Quota wait completed. Resuming operations...")
+        return True
     
     @classmethod
     def is_quota_error(cls, error):
@@ -124,19 +283,122 @@ class GeminiConfig:
         Returns:
             bool: True if it's a quota/rate limit error
         """
-        error_str = str(error).lower()
-        quota_indicators = [
-            '429',
-            'rate limit',
-            'quota exceeded',
-            'resource_exhausted',
-            'resourceexhausted',
-            'too many requests',
-            'rate_limit_exceeded',
-            'quota_exceeded'
-        ]
+        return bool(cls._QUOTA_RE.search(str(error)))
+    
+    @classmethod
+    def is_server_error(cls, error):
+        """
+        Check if the error is a transient server-side (5xx) failure
+        
+        Args:
+            error: Exception object or string
+            
+        Returns:
+            bool: True if it looks like a 5xx / service unavailable error
+        """
+        return bool(cls._SERVER_ERROR_RE.search(str(error)))
+    
+    @classmethod
+    def is_timeout_error(cls, error):
+        """
+        Check if the error is a request timeout
+        
+        Args:
+            error: Exception object or string
+            
+        Returns:
+            bool: True if the request ran out of time
+        """
+        return isinstance(error, TimeoutError) or bool(cls._TIMEOUT_RE.search(str(error)))
+    
+    @classmethod
+    def parse_retry_after(cls, error):
+        """
+        Extract the provider's requested retry delay from an error
         
-        return any(indicator in error_str for indicator in quota_indicators)
+        Args:
+            error: Exception object or string
+            
+        Returns:
+            float: Seconds to wait, or None if the error carries no hint
+        """
+        retry_after = getattr(error, 'retry_after', None)
+        if retry_after is None:
+            headers = getattr(getattr(error, 'response', None), 'headers', None)
+            if headers is not None:
+                retry_after = headers.get('Retry-After')
+        if retry_after is not None:
+            try:
+                return float(retry_after)
+            except (TypeError, ValueError):
+                pass
+        
+        match = cls._RETRY_AFTER_RE.search(str(error))
+        if match:
+            return float(match.group(1) or match.group(2))
+        return None
+    
+    @classmethod
+    def get_retry_delay(cls, error, attempt):
+        """
+        Get how long to wait before retrying after a quota error
+        
+        Honors the provider's retry hint when present, otherwise uses
+        exponential backoff with jitter.
+        
+        Args:
+            error: The quota error
+            attempt: Zero-based attempt number that failed
+            
+        Returns:
+            float: Delay in seconds
+        """
+        hint = cls.parse_retry_after(error)
+        if hint is not None:
+            return min(hint, cls.MAX_BACKOFF_TIME)
+        backoff = cls.RETRY_DELAY * cls.EXPONENTIAL_BACKOFF_BASE ** attempt + random.uniform(0, 1)
+        return min(cls.MAX_BACKOFF_TIME, backoff)
+    
+    @classmethod
+    def result_cache_key(cls, prompt, model=None, temperature=0.0):
+        """
+        Build the cache key for a finished crew result
+        
+        Args:
+            prompt: Game instructions given to the crew
+            model: Model name (defaults to DEFAULT_MODEL)
+            temperature: Sampling temperature the result is keyed on
+            
+        Returns:
+            str: Disk cache key, or None if the result should not be cached
+        """
+        if not cls.RESULT_CACHE_ENABLED:
+            return None
+        if temperature > 0 and not cls.CACHE_NONDETERMINISTIC:
+            return None
+        payload = json.dumps({
+            "model": model or cls.DEFAULT_MODEL,
+            "prompt": prompt,
+            "temperature": temperature,
+        }, sort_keys=True)
+        return "crew:" + hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    @classmethod
+    def get_latency_tracker(cls, model=None):
+        """
+        Get the shared latency tracker for a model
+        
+        Args:
+            model: Model name (defaults to DEFAULT_MODEL)
+            
+        Returns:
+            LatencyTracker: Recent successful call durations for the model
+        """
+        model = model or cls.DEFAULT_MODEL
+        with _latency_trackers_lock:
+            if model not in _latency_trackers:
+                _latency_trackers[model] = LatencyTracker(cls.LATENCY_WINDOW)
+            return _latency_trackers[model]
     
     @classmethod
     def get_adaptive_delay(cls, error_count=0):
@@ -154,4 +416,475 @@ class GeminiConfig:
         
         # Exponential backoff for consecutive errors
         adaptive_delay = cls.REQUEST_DELAY * (cls.EXPONENTIAL_BACKOFF_BASE ** min(error_count, 5))
-        return min(adaptive_delay, cls.MAX_BACKOFF_TIME)
\ No newline at end of file
+        return min(adaptive_delay, cls.MAX_BACKOFF_TIME)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter
+    
+    Tokens refill continuously at `rate` per second up to `capacity`, so
+    bursts are allowed while the long-run rate stays within the limit.
+    Callers reserve tokens up front and sleep outside the lock, which
+    keeps concurrent callers queued in arrival order.
+    """
+    
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = int(capacity)
+        self.tokens = float(capacity)
+        self.last_update = time.monotonic()
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def per_second(cls, count, burst=None):
+        """Create a bucket allowing `count` acquisitions per second"""
+        return cls(rate=count, capacity=burst or count)
+    
+    @classmethod
+    def per_minute(cls, count, burst=None):
+        """Create a bucket allowing `count` acquisitions per minute"""
+        return cls(rate=count / 60.0, capacity=burst or count)
+    
+    def _reserve(self, tokens):
+        """
+        Take tokens from the bucket, going into debt if necessary
+        
+        Returns:
+            float: Seconds the caller must wait before proceeding
+        """
+        # A request larger than the bucket could never be satisfied
+        tokens = min(tokens, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self.last_update
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.last_update = now
+            self.tokens -= tokens
+            if self.tokens >= 0:
+                return 0.0
+            # Jitter spreads out callers that were queued together
+            return -self.tokens / self.rate + random.uniform(0, 0.25 / self.rate)
+    
+    def acquire(self, tokens=1):
+        """
+        Block until `tokens` are available
+        
+        Returns:
+            bool: True once the tokens are available, False if waits were cancelled
+        """
+        wait_time = self._reserve(tokens)
+        if wait_time > 0:
+            logger.info("Rate limiter: waiting %.1f seconds", wait_time)
+            return GeminiConfig.wait(wait_time)
+        return True
+    
+    async def acquire_async(self, tokens=1):
+        """
+        Asynchronously wait until `tokens` are available
+        
+        Returns:
+            bool: True once the tokens are available, False if waits were cancelled
+        """
+        wait_time = self._reserve(tokens)
+        if wait_time > 0:
+            logger.info("Rate limiter: waiting %.1f seconds", wait_time)
+            return await GeminiConfig.wait_async(wait_time)
+        return True
+    
+    def try_acquire(self, tokens=1):
+        """Take `tokens` only if they are available now; never waits"""
+        tokens = min(tokens, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last_update) * self.rate)
+            self.last_update = now
+            if self.tokens < tokens:
+                return False
+            self.tokens -= tokens
+            return True
+
+
+# One request limiter per model, created at module load for the known models
+_rate_limiters = {}
+_token_limiters = {}
+_rate_limiters_lock = threading.Lock()
+for _model in (GeminiConfig.DEFAULT_MODEL, GeminiConfig.FALLBACK_MODEL):
+    GeminiConfig.get_rate_limiter(_model)
+    GeminiConfig.get_token_limiter(_model)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_token_encoding():
+    """Load the tiktoken encoding once, or return None if it is unavailable"""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning("tiktoken unavailable, estimating tokens from text length: %s", e)
+        return None
+
+
+class LatencyTracker:
+    """
+    Ring buffer of recent successful call durations
+    
+    The p95 of the window drives the request timeout, so slow-but-healthy
+    responses are not cut off while hung calls still fail reasonably fast.
+    """
+    
+    def __init__(self, size=100):
+        self._buffer = np.zeros(size, dtype=np.float64)
+        self._index = 0
+        self._count = 0
+        self._lock = threading.Lock()
+    
+    def record(self, duration):
+        """Add a call duration in seconds"""
+        with self._lock:
+            self._buffer[self._index] = duration
+            self._index = (self._index + 1) % len(self._buffer)
+            self._count = min(self._count + 1, len(self._buffer))
+    
+    def p95(self):
+        """Return the 95th percentile duration, or None if nothing was recorded"""
+        with self._lock:
+            if self._count == 0:
+                return None
+            return float(np.percentile(self._buffer[:self._count], 95))
+    
+    def timeout(self):
+        """Return the request timeout to use: twice the p95, clamped to the configured bounds"""
+        p95 = self.p95()
+        if p95 is None:
+            return GeminiConfig.DEFAULT_TIMEOUT
+        return max(GeminiConfig.MIN_TIMEOUT, min(GeminiConfig.MAX_TIMEOUT, 2 * p95))
+    
+    def hedge_delay(self):
+        """Return how long to wait before hedging: the p95, but at least HEDGE_DELAY"""
+        p95 = self.p95()
+        return GeminiConfig.HEDGE_DELAY if p95 is None else max(GeminiConfig.HEDGE_DELAY, p95)
+
+
+_latency_trackers = {}
+_latency_trackers_lock = threading.Lock()
+
+
+class CircuitOpenError(Exception):
+    """Raised when the circuit breaker is rejecting calls to the API"""
+    pass
+
+
+class LLMCancelledError(Exception):
+    """Raised when an LLM call is abandoned because the user cancelled waits"""
+    pass
+
+
+class CircuitBreaker:
+    """
+    Process-wide circuit breaker around Gemini API calls
+    
+    CLOSED: calls flow normally and failures are counted.
+    OPEN: calls fail fast until the recovery timeout has passed.
+    HALF_OPEN: a single probe call is admitted; its outcome closes or
+    reopens the circuit.
+    """
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self, failure_threshold=None, recovery_timeout=None):
+        self.failure_threshold = failure_threshold or GeminiConfig.CIRCUIT_FAILURE_THRESHOLD
+        self.recovery_timeout = recovery_timeout or GeminiConfig.CIRCUIT_RECOVERY_TIMEOUT
+        self.state = self.CLOSED
+        self.failure_count = 0
+        self.opened_at = 0.0
+        self.half_open_inflight = False
+        self._lock = threading.Lock()
+    
+    def before_call(self):
+        """
+        Admit or reject a call
+        
+        Raises:
+            CircuitOpenError: If the circuit is open, or a half-open probe is already running
+        """
+        with self._lock:
+            if self.state == self.OPEN:
+                remaining = self.recovery_timeout - (time.monotonic() - self.opened_at)
+                if remaining > 0:
+                    raise CircuitOpenError(
+                        f"Circuit breaker open after repeated rate limit errors; retry in {remaining:.0f}s"
+                    )
+                self.state = self.HALF_OPEN
+                self.half_open_inflight = False
+                logger.info("Circuit breaker half-open - sending probe request")
+            
+            if self.state == self.HALF_OPEN:
+                if self.half_open_inflight:
+                    raise CircuitOpenError("Circuit breaker half-open; probe request already in flight")
+                self.half_open_inflight = True
+    
+    def record_success(self):
+        """Close the circuit after a successful call"""
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("Circuit breaker closed - API calls recovered")
+            self.state = self.CLOSED
+            self.failure_count = 0
+            self.half_open_inflight = False
+    
+    def record_failure(self):
+        """Count a quota/server failure, opening the circuit at the threshold"""
+        with self._lock:
+            self.failure_count += 1
+            self.half_open_inflight = False
+            if self.state == self.HALF_OPEN or self.failure_count >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.error("Circuit breaker opened after %s consecutive failures", self.failure_count)
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+    
+    def release(self):
+        """End a call whose error says nothing about API health"""
+        with self._lock:
+            self.half_open_inflight = False
+    
+    @property
+    def is_open(self):
+        return self.state == self.OPEN
+
+
+# Shared by every LLM instance in the process
+circuit_breaker = CircuitBreaker()
+
+
+class DiskCache:
+    """
+    SQLite-backed key/value store with per-entry expiry
+    
+    Values are pickled. An optional embedding is stored alongside each value
+    so the semantic cache can reload its vectors in a single query. Expiry
+    times are wall-clock (time.time) because they must survive restarts.
+    The database is opened on first access, not when config is imported.
+    """
+    
+    def __init__(self, path=None):
+        self.path = path or GeminiConfig.DISK_CACHE_PATH
+        self._lock = threading.Lock()
+        self._conn = None
+        self._opened = False
+    
+    def _connect(self):
+        """Open the database once, or return None if the disk cache is unavailable"""
+        with self._lock:
+            if self._opened:
+                return self._conn
+            self._opened = True
+            if not GeminiConfig.DISK_CACHE_ENABLED:
+                return None
+            try:
+                self._conn = sqlite3.connect(self.path, check_same_thread=False)
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS kv ("
+                    "key TEXT PRIMARY KEY, value BLOB, expires_at REAL, embedding BLOB)"
+                )
+                self._conn.execute("DELETE FROM kv WHERE expires_at < ?", (time.time(),))
+                self._conn.commit()
+            except Exception as e:
+                logger.warning("Disk cache disabled: %s", e)
+                self._conn = None
+            return self._conn
+    
+    def get(self, key):
+        """Return the stored value for key, or None if missing or expired"""
+        if key is None or self._connect() is None:
+            return None
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT value FROM kv WHERE key = ? AND expires_at >= ?", (key, time.time())
+                ).fetchone()
+            return pickle.loads(row[0]) if row else None
+        except Exception as e:
+            logger.warning("Disk cache read failed: %s", e)
+            return None
+    
+    def put(self, key, value, ttl=None, embedding=None):
+        """Store value under key for ttl seconds (defaults to DISK_CACHE_TTL)"""
+        if key is None or self._connect() is None:
+            return
+        ttl = GeminiConfig.DISK_CACHE_TTL if ttl is None else ttl
+        blob = None if embedding is None else np.asarray(embedding, dtype=np.float32).tobytes()
+        try:
+            data = pickle.dumps(value)
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO kv (key, value, expires_at, embedding) VALUES (?, ?, ?, ?)",
+                    (key, data, time.time() + ttl, blob)
+                )
+                self._conn.commit()
+        except Exception as e:
+            logger.warning("Disk cache write failed: %s", e)
+    
+    def scan_embeddings(self, prefix=""):
+        """
+        Load every unexpired embedding whose key starts with prefix
+        
+        Returns:
+            tuple: (list of keys, float32 matrix with one embedding per row)
+        """
+        if self._connect() is None:
+            return [], np.empty((0, 0), dtype=np.float32)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, embedding FROM kv WHERE embedding IS NOT NULL "
+                "AND key LIKE ? AND expires_at >= ?", (prefix + "%", time.time())
+            ).fetchall()
+        if not rows:
+            return [], np.empty((0, 0), dtype=np.float32)
+        keys = [row[0] for row in rows]
+        matrix = np.stack([np.frombuffer(row[1], dtype=np.float32) for row in rows])
+        return keys, matrix
+
+
+# Shared persistent cache for LLM responses
+disk_cache = DiskCache()
+
+
+class SemanticCache:
+    """
+    Embedding-based response cache that matches semantically similar prompts
+    
+    Entries are kept in least-recently-used order and expire after a TTL.
+    Prompts are only compared against entries with the same scope, so a hit
+    never crosses models or system prompts. Persisted entries are loaded
+    from the disk cache on first lookup or store.
+    """
+    
+    def __init__(self, threshold=None, max_entries=None, ttl=None, disk=None):
+        self.threshold = GeminiConfig.SEMANTIC_THRESHOLD if threshold is None else threshold
+        self.max_entries = GeminiConfig.SEMANTIC_CACHE_SIZE if max_entries is None else max_entries
+        self.ttl = GeminiConfig.SEMANTIC_CACHE_TTL if ttl is None else ttl
+        self.disk = disk
+        self.entries = []  # [scope, embedding, result, stored_at], oldest use first
+        self._model = None
+        self._model_failed = False
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._loaded = False
+    
+    def _get_model(self):
+        """Load the sentence-transformers model once, or return None if unavailable"""
+        if self._model is None and not self._model_failed:
+            try:
+                from sentence_transformers import SentenceTransformer
+                self._model = SentenceTransformer(GeminiConfig.SEMANTIC_MODEL)
+                logger.info("Loaded semantic cache embedding model %s", GeminiConfig.SEMANTIC_MODEL)
+            except Exception as e:
+                self._model_failed = True
+                logger.warning("Semantic cache disabled: %s", e)
+        return self._model
+    
+    def embed(self, text):
+        """
+        Compute the L2-normalized embedding of text
+        
+        Returns:
+            np.ndarray: float32 vector, or None if no embedding model is available
+        """
+        if not GeminiConfig.SEMANTIC_CACHE_ENABLED or not text:
+            return None
+        with self._lock:
+            model = self._get_model()
+        if model is None:
+            return None
+        
+        embedding = np.asarray(model.encode(text), dtype=np.float32)
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm else embedding
+    
+    def _expire(self, now):
+        """Drop entries older than the TTL (caller holds the lock)"""
+        self.entries = [e for e in self.entries if now - e[3] < self.ttl]
+    
+    def get(self, scope, embedding):
+        """
+        Find the cached result most similar to embedding
+        
+        Returns:
+            The cached result if its similarity reaches the threshold, else None
+        """
+        if embedding is None:
+            return None
+        self._ensure_loaded()
+        
+        with self._lock:
+            self._expire(time.monotonic())
+            # Skip vectors of another size (e.g. persisted by a different model)
+            candidates = [
+                i for i, e in enumerate(self.entries)
+                if e[0] == scope and e[1].shape == embedding.shape
+            ]
+            if not candidates:
+                return None
+            
+            matrix = np.stack([self.entries[i][1] for i in candidates])
+            scores = matrix @ embedding
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            
+            # Mark as recently used
+            entry = self.entries.pop(candidates[best])
+            self.entries.append(entry)
+            logger.info("Semantic cache hit (similarity %.3f)", scores[best])
+            return entry[2]
+    
+    def put(self, scope, embedding, result):
+        """Store a result, evicting least recently used entries when full"""
+        if embedding is None:
+            return
+        self._ensure_loaded()
+        
+        with self._lock:
+            self.entries.append([scope, embedding, result, time.monotonic()])
+            if len(self.entries) > self.max_entries:
+                del self.entries[:len(self.entries) - self.max_entries]
+        
+        # Write through so later runs can reuse the entry
+        if self.disk is not None:
+            key = f"sem:{scope}:{hashlib.sha256(embedding.tobytes()).hexdigest()}"
+            self.disk.put(key, result, self.ttl, embedding=embedding)
+    
+    def _ensure_loaded(self):
+        """Load persisted entries the first time the cache is used"""
+        if self._loaded:
+            return
+        with self._load_lock:
+            if not self._loaded:
+                self.load()
+                self._loaded = True
+    
+    def load(self):
+        """Load persisted entries from the disk cache"""
+        if not GeminiConfig.SEMANTIC_CACHE_ENABLED or self.disk is None:
+            return
+        keys, matrix = self.disk.scan_embeddings(prefix="sem:")
+        entries = []
+        now = time.monotonic()
+        for key, embedding in zip(keys, matrix):
+            result = self.disk.get(key)
+            if result is not None:
+                entries.append([key.split(":")[1], embedding, result, now])
+        with self._lock:
+            self.entries = (entries + self.entries)[-self.max_entries:]
+        if entries:
+            logger.info("Loaded %s semantic cache entries from disk", len(self.entries))
+
+
+# Shared semantic cache, persisted through the disk cache
+semantic_cache = SemanticCache(disk=disk_cache)
\ No newline at end of file
@@ -1,137 +1,189 @@
-from crewai import Crew, Process
 from agents import GameBuilderAgents
 from tasks import GameBuilderTasks
-from tools import GameBuilderTools
-from config import GeminiConfig
+from tools import GameBuilderTools, review_report
+from config import GeminiConfig, CircuitOpenError, LLMCancelledError
+import re
 import time
+import functools
+from textwrap import dedent
+import asyncio
 import logging
+import threading
 
-# Set up logging to track rate limiting
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+_CODE_FENCE_RE = re.compile(r"^```(?:python)?[ \t]*\n|\n```\s*$")
+_VARIANT_RE = re.compile(r"<variant id=(\d+)>\s*(.*?)\s*</variant>", re.DOTALL)
+
+
+def _compiles(code):
+    """Return True if code (optionally wrapped in a markdown fence) is valid Python"""
+    try:
+        compile(_CODE_FENCE_RE.sub("", code.strip()), "<generated>", "exec")
+        return True
+    except (SyntaxError, ValueError):
+        return False
+
+
 class GameBuilderCrew:
     def __init__(self):
         self.agents = GameBuilderAgents()
         self.tasks = GameBuilderTasks()
         self.tools = GameBuilderTools()
         self.consecutive_errors = 0
+        self._tools_attached = False
+        # CrewAI mutates Agent state during a run and the agents are reused,
+        # so runs on one crew are serialized; use one crew per concurrent run
+        self._run_lock = threading.Lock()
 
     def run(self, game_instructions):
         """
         Run the crew with intelligent quota handling and automatic recovery
+        
+        Retries and backoff happen inside the resilient LLM for each request;
+        once it gives up (or the circuit breaker opens) the run ends here.
         """
-        quota_retry_count = 0
+        with self._run_lock:
+            return self._run(game_instructions)
+
+    def _run(self, game_instructions):
+        """Run the crew once (caller holds the run lock)"""
+        from crewai import Crew, Process
         
-        while quota_retry_count < GeminiConfig.MAX_QUOTA_RETRIES:
-            try:
-                logger.info(f"Starting crew execution (attempt {quota_retry_count + 1})")
-                
-                # Add adaptive delay based on previous errors
-                adaptive_delay = GeminiConfig.get_adaptive_delay(self.consecutive_errors)
-                if adaptive_delay > GeminiConfig.REQUEST_DELAY:
-                    logger.info(f"Using adaptive delay of {adaptive_delay} seconds due to previous errors")
-                    time.sleep(adaptive_delay)
-                else:
-                    GeminiConfig.add_request_delay()
-                
-                # Create agents
-                senior_engineer = self.agents.senior_engineer_agent()
-                qa_engineer = self.agents.qa_engineer_agent()
-                chief_qa_engineer = self.agents.chief_qa_engineer_agent()
-                
-                # Add tools to agents
-                qa_engineer.tools = [self.tools.validate_python_code, self.tools.scan_security_issues]
+        try:
+            logger.info("Starting crew execution")
+            
+            # Add adaptive delay based on previous errors; normal pacing is
+            # handled by the LLM's token bucket rate limiter
+            adaptive_delay = GeminiConfig.get_adaptive_delay(self.consecutive_errors)
+            if adaptive_delay > GeminiConfig.REQUEST_DELAY:
+                logger.info("Using adaptive delay of %s seconds due to previous errors", adaptive_delay)
+                GeminiConfig.wait(adaptive_delay)
+            
+            # Get agents (built once and reused across runs)
+            senior_engineer = self.agents.senior_engineer_agent()
+            qa_engineer = self.agents.qa_engineer_agent()
+            chief_qa_engineer = self.agents.chief_qa_engineer_agent()
+            
+            # Add tools to agents
+            if not self._tools_attached:
+                qa_engineer.tools = [self.tools.combined_code_review]
                 chief_qa_engineer.tools = [self.tools.validate_python_code]
-                
-                # Create tasks
-                code_task = self.tasks.code_task(senior_engineer, game_instructions)
-                review_task = self.tasks.review_task(qa_engineer, game_instructions)
-                evaluate_task = self.tasks.evaluate_task(chief_qa_engineer, game_instructions)
-                
-                # Create crew with rate limit friendly settings
-                crew = Crew(
-                    agents=[senior_engineer, qa_engineer, chief_qa_engineer],
-                    tasks=[code_task, review_task, evaluate_task],
-                    process=Process.sequential,
-                    verbose=True,
-                    max_rpm=3,  # Very conservative requests per minute - reduced from 5
-                    step_callback=self._rate_limit_callback  # Enhanced callback for rate limiting
+                self._tools_attached = True
+            
+            # Create tasks
+            code_task = self.tasks.code_task(senior_engineer, game_instructions)
+            if GeminiConfig.PARALLEL_REVIEW:
+                # Review and evaluation both start from the generated code; the
+                # review runs in a background thread while the evaluation runs
+                review_task = self.tasks.review_task(
+                    qa_engineer, game_instructions, context=[code_task], async_execution=True
                 )
-                
-                # Execute the crew with rate limit handling
-                logger.info("Executing crew tasks with rate limit protection...")
-                result = crew.kickoff()
-                
-                # Reset error count on success
-                self.consecutive_errors = 0
-                logger.info("Crew execution completed successfully")
-                return result
-                
-            except Exception as e:
-                error_str = str(e).lower()
-                
-                # Enhanced rate limit detection
-                is_rate_limit_error = (
-                    GeminiConfig.is_quota_error(e) or
-                    'rate limit' in error_str or
-                    'quota' in error_str or
-                    'too many requests' in error_str or
-                    '429' in error_str or
-                    'resource_exhausted' in error_str or
-                    'iteration limit' in error_str or
-                    'time limit' in error_str
+                evaluate_task = self.tasks.evaluate_task(
+                    chief_qa_engineer, game_instructions, context=[code_task]
                 )
+            else:
+                review_task = self.tasks.review_task(qa_engineer, game_instructions)
+                evaluate_task = self.tasks.evaluate_task(chief_qa_engineer, game_instructions)
+            
+            # Check the generated code as soon as it exists, so the review
+            # starts from the report instead of spending a turn on the tool
+            code_task.callback = functools.partial(self._attach_review_report, review_task)
+            
+            # Create crew with rate limit friendly settings
+            crew = Crew(
+                agents=[senior_engineer, qa_engineer, chief_qa_engineer],
+                tasks=[code_task, review_task, evaluate_task],
+                process=Process.sequential,
+                verbose=True,
+                max_rpm=GeminiConfig.REQUESTS_PER_MINUTE,  # Matches the LLM token bucket
+                step_callback=self._rate_limit_callback  # Enhanced callback for rate limiting
+            )
+            
+            # Execute the crew with rate limit handling
+            logger.info("Executing crew tasks with rate limit protection...")
+            result = crew.kickoff()
+            if GeminiConfig.PARALLEL_REVIEW:
+                result = self._pick_parallel_result(review_task, result)
+            
+            # Reset error count on success
+            self.consecutive_errors = 0
+            logger.info("Crew execution completed successfully")
+            return result
+            
+        except CircuitOpenError as e:
+            # The API keeps rejecting calls - retrying here would only prolong the wait
+            logger.error("Circuit breaker open, aborting crew execution: %s", e)
+            self.consecutive_errors += 1
+            return self._create_error_response("rate_limit_exceeded")
+            
+        except LLMCancelledError:
+            # The user interrupted the run - not an API error to report
+            logger.info("Crew execution cancelled by user")
+            raise
+            
+        except Exception as e:
+            self.consecutive_errors += 1
+            error_str = str(e).lower()
+            
+            # CrewAI reports throttled agents as hitting their iteration/time limits
+            is_rate_limit_error = (
+                GeminiConfig.is_quota_error(e) or
+                'iteration limit' in error_str or
+                'time limit' in error_str
+            )
+            
+            if is_rate_limit_error:
+                logger.error("Rate limit/quota error persisted after LLM retries: %s", e)
+                return self._create_error_response("rate_limit_exceeded")
+            
+            logger.error("Non-rate-limit error occurred: %s", e)
+            raise e
+    
+    def _attach_review_report(self, review_task, code_output):
+        """Append the Code Review report of the generated code to the review task"""
+        try:
+            code = _CODE_FENCE_RE.sub("", str(code_output.raw_output).strip())
+            review_task.description += dedent(f"""
                 
-                if is_rate_limit_error:
-                    logger.warning(f"Rate limit/quota error detected: {e}")
-                    
-                    # Handle the error with increasing wait times
-                    if quota_retry_count < GeminiConfig.MAX_QUOTA_RETRIES - 1:
-                        wait_time = 60 + (quota_retry_count * 30)  # 60s, 90s, 120s, etc.
-                        logger.info(f"Rate limit detected - waiting {wait_time} seconds before retry...")
-                        time.sleep(wait_time)
-                        
-                        quota_retry_count += 1
-                        self.consecutive_errors += 1
-                        logger.info(f"Retrying crew execution (attempt {quota_retry_count + 1})")
-                        continue
-                    else:
-                        logger.error("Maximum rate limit retry attempts exceeded")
-                        return self._create_error_response("rate_limit_exceeded")
-                else:
-                    logger.error(f"Non-rate-limit error occurred: {e}")
-                    # For non-rate-limit errors, try a few times with exponential backoff
-                    if self.consecutive_errors < 3:
-                        self.consecutive_errors += 1
-                        wait_time = 10 * (2 ** self.consecutive_errors)
-                        logger.info(f"Retrying after {wait_time} seconds due to error...")
-                        time.sleep(wait_time)
-                        continue
-                    else:
-                        logger.error("Maximum consecutive errors reached")
-                        raise e
+                Code Review report for the code you got (the tool has already been
+                run on it; only call it again if you change the code):
+                {review_report(code)}
+            """)
+        except Exception as e:
+            logger.warning("Could not pre-compute the code review report: %s", e)
+    
+    def _pick_parallel_result(self, review_task, evaluated):
+        """
+        Choose the final code when review and evaluation ran concurrently
+        
+        Neither task saw the other's changes, so the evaluated code is kept
+        unless it fails to compile and the reviewed code does.
+        """
+        thread = getattr(review_task, "thread", None)
+        if thread is not None:
+            thread.join()
+        reviewed = review_task.output.raw_output if review_task.output else None
         
-        # If we exit the loop, we've exceeded max retries
-        return self._create_error_response("max_retries_exceeded")
+        if reviewed and not _compiles(str(evaluated)) and _compiles(reviewed):
+            logger.info("Evaluated code does not compile - using the reviewed code instead")
+            return reviewed
+        return evaluated
     
     def _rate_limit_callback(self, step):
         """Enhanced callback function to handle rate limits between steps"""
         try:
-            logger.info(f"Completed step: {step}")
+            logger.info("Completed step: %s", step)
             
-            # Add longer delay between steps to prevent rate limiting
-            base_delay = 15  # Base 15 seconds between steps
+            # Request pacing is done by the token bucket before each LLM call;
+            # only back off here while recovering from previous errors
             adaptive_delay = GeminiConfig.get_adaptive_delay(self.consecutive_errors)
-            final_delay = max(base_delay, adaptive_delay)
-            
-            logger.info(f"Adding {final_delay} second delay between steps to prevent rate limits...")
-            time.sleep(final_delay)
+            if adaptive_delay > GeminiConfig.REQUEST_DELAY:
+                logger.info("Adding %s second delay between steps due to previous errors...", adaptive_delay)
+                GeminiConfig.wait(adaptive_delay)
             
         except Exception as e:
-            logger.warning(f"Step callback error: {e}")
-            # Add a safety delay even if callback fails
-            time.sleep(20)
+            logger.warning("Step callback error: %s", e)
     
     def _create_error_response(self, error_type):
         """Create a helpful error response for different error types"""
@@ -154,10 +206,10 @@ Unfortunately, the Google Gemini API rate limit has been exceeded and automatic
 5. **Simplify request**: Try creating a simpler game to reduce API calls
 
 ## The system automatically:
-- Waits 60+ seconds between retries
-- Adds delays between agent steps
-- Limits requests per minute to 3
+- Waits as long as the API asks before retrying
+- Paces requests with a per-minute rate limiter
 - Uses exponential backoff for retries
+- Stops early when the API keeps rejecting requests
 
 ## To retry:
 Wait 5-10 minutes and run the program again. The rate limits should reset.
@@ -204,33 +256,94 @@ Wait a few minutes and try running the program again.
         else:
             return f"Game creation failed due to: {error_type}"
     
-    def run_with_monitoring(self, game_instructions):
+    async def run_async(self, game_instructions):
         """
-        Run the crew with enhanced monitoring and logging
+        Run the crew without blocking the event loop
+        
+        CrewAI executes the sequential process synchronously, so the run is
+        moved to a worker thread. Runs on the same crew still happen one at
+        a time; the LLM's token bucket paces the actual API requests.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(None, self.run, game_instructions)
+        except asyncio.CancelledError:
+            # Ctrl-C cancels this coroutine, but asyncio.run then waits for the
+            # worker thread; cut its waits short so it can finish quickly
+            GeminiConfig.cancel_waits()
+            raise
+    
+    async def abatched_generate(self, prompts):
+        """
+        Generate code for several game prompts with a single LLM request
+        
+        Packing prompts into one request trades a longer response for fewer
+        requests against the per-minute limit. Only the code generation step
+        runs; there is no review or evaluation.
+        
+        Returns:
+            list: One code string per prompt, or None where the response could
+            not be split or the variant does not compile (the caller should
+            run those prompts on their own)
+        """
+        request = (
+            f"Produce {len(prompts)} independent Python game implementations, one for each "
+            "request below. Return each as the full python code wrapped in "
+            "<variant id=N>...</variant>, where N is the request number, and nothing else.\n\n"
+            + "\n---\n".join(f"Request {i}:\n{dedent(prompt).strip()}" for i, prompt in enumerate(prompts, 1))
+        )
+        message = await self.agents.llm.ainvoke(request)
+        variants = {int(i): code for i, code in _VARIANT_RE.findall(str(message.content))}
+        if len(variants) < len(prompts):
+            logger.warning("Batched response contained %s of %s variants", len(variants), len(prompts))
+        results = []
+        for i in range(1, len(prompts) + 1):
+            code = variants.get(i)
+            if code and not _compiles(code):
+                logger.warning("Batched variant %s does not compile - discarding it", i)
+                code = None
+            results.append(code or None)
+        return results
+    
+    def batched_generate(self, prompts):
+        """
+        Generate code for several game prompts with a single LLM request
         """
-        start_time = time.time()
+        return asyncio.run(self.abatched_generate(prompts))
+    
+    async def arun_with_monitoring(self, game_instructions):
+        """
+        Run the crew asynchronously with enhanced monitoring and logging
+        """
+        start_time = time.monotonic()
         logger.info("="*50)
         logger.info("STARTING GAME CREATION WITH RATE LIMIT PROTECTION")
         logger.info("="*50)
         
         try:
-            result = self.run(game_instructions)
-            end_time = time.time()
+            result = await self.run_async(game_instructions)
+            end_time = time.monotonic()
             duration = end_time - start_time
             
             logger.info("="*50)
-            logger.info(f"GAME CREATION COMPLETED in {duration:.1f} seconds")
+            logger.info("GAME CREATION COMPLETED in %.1f seconds", duration)
             logger.info("="*50)
             
             return result
             
         except Exception as e:
-            end_time = time.time()
+            end_time = time.monotonic()
             duration = end_time - start_time
             
             logger.error("="*50)
-            logger.error(f"GAME CREATION FAILED after {duration:.1f} seconds")
-            logger.error(f"Error: {e}")
+            logger.error("GAME CREATION FAILED after %.1f seconds", duration)
+            logger.error("Error: %s", e)
             logger.error("="*50)
             
-            raise e
\ No newline at end of file
+            raise e
+    
+    def run_with_monitoring(self, game_instructions):
+        """
+        Run the crew with enhanced monitoring and logging
+        """
+        return asyncio.run(self.arun_with_monitoring(game_instructions))
\ No newline at end of file
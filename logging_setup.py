@@ -0,0 +1,12 @@
+import logging
+
+# Set up enhanced logging for the whole application. Library modules only
+# create loggers; this is the single place handlers are configured.
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler(),
+        logging.FileHandler('game_builder.log')
+    ]
+)
\ No newline at end of file
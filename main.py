@@ -1,23 +1,15 @@
 import sys
 import os
-import time
+import asyncio
 import logging
+import contextlib
 from dotenv import load_dotenv
-from crew import GameBuilderCrew
-from config import GeminiConfig
+import logging_setup  # noqa: F401 - configures logging once for the whole application
+from config import GeminiConfig, disk_cache
 
 # Load environment variables
 load_dotenv()
 
-# Set up enhanced logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('game_builder.log')
-    ]
-)
 logger = logging.getLogger(__name__)
 
 # Check if Google API key is set
@@ -75,9 +67,34 @@ def check_api_status():
         
         return True
     except Exception as e:
-        logger.error(f"✗ Configuration error: {e}")
+        logger.error("✗ Configuration error: %s", e)
         return False
 
+async def arun_crew_cached(crew, game_instructions):
+    """
+    Run the crew, reusing the stored result if these instructions were built before
+    
+    Returns:
+        tuple: (result, True if the result came from the cache)
+    """
+    # Key on the model and temperature the crew actually runs with
+    llm = crew.agents.llm
+    key = GeminiConfig.result_cache_key(game_instructions, model=llm.model, temperature=llm.temperature)
+    cached = disk_cache.get(key)
+    if cached is not None:
+        logger.info("Crew result cache hit - skipping crew run")
+        return cached, True
+    
+    result = await crew.arun_with_monitoring(game_instructions)
+    # Failure reports are not cached so the next run tries again
+    if not isinstance(result, str) or "# Game Creation Failed" not in result:
+        disk_cache.put(key, str(result))
+    return result, False
+
+def run_crew_cached(crew, game_instructions):
+    """Synchronous wrapper around arun_crew_cached"""
+    return asyncio.run(arun_crew_cached(crew, game_instructions))
+
 def display_examples():
     """Display available game examples"""
     print("\n=== EXAMPLE GAMES FOR REFERENCE ===")
@@ -260,8 +277,12 @@ def run():
     
     try:
         # Create and run the crew with enhanced monitoring
+        # Imported here so the help/monitor commands don't load crewai
+        from crew import GameBuilderCrew
         crew = GameBuilderCrew()
-        result = crew.run_with_monitoring(game_instructions)
+        result, cached = run_crew_cached(crew, game_instructions)
+        if cached:
+            print("♻️  These instructions were built before - reusing the saved result")
         
         # Check if result is an error message
         if isinstance(result, str) and "# Game Creation Failed" in result:
@@ -301,6 +322,8 @@ def run():
                 print(f"❌ Error saving file: {e}")
         
     except KeyboardInterrupt:
+        # Stop quota waits still running in the crew's worker thread
+        GeminiConfig.cancel_waits()
         print("\n\n❌ Game creation interrupted by user.")
         logger.info("Game creation interrupted by user")
         
@@ -330,35 +353,57 @@ def run():
         else:
             print(f"\n❌ Unexpected error occurred: {e}")
             print("💡 Please check the logs for more details.")
-            logger.error(f"Unexpected error in main: {e}", exc_info=True)
+            logger.error("Unexpected error in main: %s", e, exc_info=True)
 
 def train():
     """
     Train the crew for a given number of iterations with quota awareness
+    
+    Prompts are answered before the event loop starts, so no worker thread
+    is left blocked on input() if training is interrupted.
     """
-    if len(sys.argv) < 3:
+    if len(sys.argv) < 4:
         print("Usage: python main.py train <n_iterations> <filename>")
         return
     
     try:
-        n_iterations = int(sys.argv[1])
-        filename = sys.argv[2]
-        
-        print("⚠️  Warning: Training will use significant API quota!")
-        estimated_calls = n_iterations * 6  # 3 agents * 2 iterations average
-        print(f"📊 Estimated API calls: {estimated_calls}")
-        print(f"⏱️  Estimated time with quota handling: {estimated_calls * 4} seconds")
-        
-        # Ask for confirmation
-        confirm = input("Continue with training? (y/N): ").lower().strip()
-        if confirm != 'y':
-            print("❌ Training cancelled.")
-            return
-            
-        if not check_api_status():
-            print("❌ API status check failed. Cannot proceed with training.")
-            return
+        n_iterations = int(sys.argv[2])
+        filename = sys.argv[3]
+    except ValueError:
+        print("❌ Invalid number of iterations. Please provide a valid integer.")
+        return
+    
+    print("⚠️  Warning: Training will use significant API quota!")
+    estimated_calls = n_iterations * 6  # 3 agents * 2 iterations average
+    print(f"📊 Estimated API calls: {estimated_calls}")
+    print(f"⏱️  Estimated time with quota handling: {estimated_calls * 4} seconds")
+    
+    # Ask for confirmation
+    confirm = input("Continue with training? (y/N): ").lower().strip()
+    if confirm != 'y':
+        print("❌ Training cancelled.")
+        return
         
+    if not check_api_status():
+        print("❌ API status check failed. Cannot proceed with training.")
+        return
+    
+    try:
+        asyncio.run(train_async(n_iterations, filename))
+    except KeyboardInterrupt:
+        # Stop quota waits still running in the crews' worker threads
+        GeminiConfig.cancel_waits()
+        print("\n\n❌ Training interrupted by user.")
+        logger.info("Training interrupted by user")
+
+async def train_async(n_iterations, filename):
+    """
+    Run the training iterations and save their results to filename
+    
+    Up to MAX_CONCURRENT iterations run at once; the LLM's rate limiter
+    paces the API requests they make.
+    """
+    try:
         # Use Snake game for training (shortest example)
         game_instructions = GAME_EXAMPLES['example3_snake']
         
@@ -366,49 +411,97 @@ def train():
         print(f"💾 Training data will be saved to {filename}")
         print("🔄 Using Snake game example for consistent training data")
         
-        # Create crew and attempt training
-        crew = GameBuilderCrew()
+        # Create crews and attempt training
+        # Imported here so the help/monitor commands don't load crewai
+        from crew import GameBuilderCrew
         
-        training_results = []
-        successful_runs = 0
+        # A crew runs one iteration at a time, so each concurrent slot gets its own
+        crews = asyncio.Queue()
+        for _ in range(max(1, GeminiConfig.MAX_CONCURRENT)):
+            crews.put_nowait(GameBuilderCrew())
         
-        for i in range(n_iterations):
-            print(f"\n📈 Training iteration {i+1}/{n_iterations}")
+        @contextlib.asynccontextmanager
+        async def checkout_crew():
+            crew = await crews.get()
             try:
-                result = crew.run_with_monitoring(game_instructions)
-                if not isinstance(result, str) or "# Game Creation Failed" not in result:
-                    training_results.append({
-                        'iteration': i+1,
-                        'status': 'success',
-                        'result': str(result)[:500] + "..." if len(str(result)) > 500 else str(result)
-                    })
-                    successful_runs += 1
-                    print(f"✅ Iteration {i+1} completed successfully")
-                else:
-                    training_results.append({
+                yield crew
+            finally:
+                crews.put_nowait(crew)
+        
+        quota_errors = 0  # Consecutive quota errors, drives the cooldown backoff
+        
+        def success_entry(i, result):
+            print(f"✅ Iteration {i+1} completed successfully")
+            return {
+                'iteration': i+1,
+                'status': 'success',
+                'result': str(result)[:500] + "..." if len(str(result)) > 500 else str(result)
+            }
+        
+        async def cool_down(error):
+            # Hold this slot for as long as the API asks, or back off
+            # exponentially when it gives no hint
+            nonlocal quota_errors
+            delay = GeminiConfig.get_retry_delay(error, quota_errors)
+            quota_errors += 1
+            print(f"⏰ Quota error detected, waiting {delay:.0f} seconds before continuing...")
+            await GeminiConfig.wait_async(delay)
+        
+        async def run_iteration(i):
+            nonlocal quota_errors
+            async with checkout_crew() as crew:
+                print(f"\n📈 Training iteration {i+1}/{n_iterations}")
+                try:
+                    result, _ = await arun_crew_cached(crew, game_instructions)
+                    if not isinstance(result, str) or "# Game Creation Failed" not in result:
+                        quota_errors = 0
+                        return success_entry(i, result)
+                    print(f"❌ Iteration {i+1} failed due to quota/system issues")
+                    # The crew reports rate limit failures as a message instead of raising
+                    await cool_down(result)
+                    return {
                         'iteration': i+1,
                         'status': 'failed',
                         'error': 'Quota or system error'
-                    })
-                    print(f"❌ Iteration {i+1} failed due to quota/system issues")
-                
-                # Add delay between training iterations
-                if i < n_iterations - 1:
-                    print("⏳ Adding delay between training iterations...")
-                    time.sleep(30)  # 30 second delay between iterations
+                    }
                     
-            except Exception as e:
-                training_results.append({
-                    'iteration': i+1,
-                    'status': 'error',
-                    'error': str(e)
-                })
-                print(f"❌ Iteration {i+1} encountered error: {e}")
-                
-                # If quota error, wait longer
-                if GeminiConfig.is_quota_error(e):
-                    print("⏰ Quota error detected, waiting 2 minutes before continuing...")
-                    time.sleep(120)
+                except Exception as e:
+                    print(f"❌ Iteration {i+1} encountered error: {e}")
+                    
+                    if GeminiConfig.is_quota_error(e):
+                        await cool_down(e)
+                    return {
+                        'iteration': i+1,
+                        'status': 'error',
+                        'error': str(e)
+                    }
+        
+        async def run_batch(batch):
+            async with checkout_crew() as crew:
+                print(f"\n📈 Training iterations {batch[0]+1}-{batch[-1]+1}/{n_iterations} in one request")
+                try:
+                    variants = await crew.abatched_generate([game_instructions] * len(batch))
+                except Exception as e:
+                    logger.warning("Batched generation failed, running iterations one by one: %s", e)
+                    variants = [None] * len(batch)
+            
+            # Iterations missing from the batched response, or whose code does
+            # not compile, run through the crew
+            return [
+                success_entry(i, code) if code is not None else await run_iteration(i)
+                for i, code in zip(batch, variants)
+            ]
+        
+        batch_size = max(1, GeminiConfig.TRAIN_BATCH_SIZE)
+        if batch_size > 1:
+            print(f"📦 Generating {batch_size} iterations per request")
+            batches = [list(range(start, min(start + batch_size, n_iterations)))
+                       for start in range(0, n_iterations, batch_size)]
+            groups = await asyncio.gather(*(run_batch(batch) for batch in batches))
+            training_results = [entry for group in groups for entry in group]
+        else:
+            training_results = await asyncio.gather(*(run_iteration(i) for i in range(n_iterations)))
+        successful_runs = sum(1 for entry in training_results if entry['status'] == 'success')
         
         # Save training results
         try:
@@ -428,10 +521,8 @@ def train():
         except Exception as e:
             print(f"❌ Error saving training results: {e}")
         
-    except ValueError:
-        print("❌ Invalid number of iterations. Please provide a valid integer.")
     except Exception as e:
-        logger.error(f"Training error: {e}", exc_info=True)
+        logger.error("Training error: %s", e, exc_info=True)
         print(f"❌ Training failed: {e}")
 
 def monitor_quota():
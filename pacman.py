@@ -2,6 +2,7 @@
 import pygame
 import random
 import math
+from collections import OrderedDict
 
 # Initialize Pygame
 pygame.init()
@@ -32,6 +33,22 @@ maze = [
     [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1],
 ]
 
+# Flat row-major copy of the maze for single-subscript wall lookups
+W, H = len(maze[0]), len(maze)
+MAZE_FLAT = bytes(v for row in maze for v in row)
+
+
+# Sprites are rendered once and blitted each frame
+def _ghost_sprite(color):
+    sprite = pygame.Surface((CELL_SIZE, CELL_SIZE))
+    sprite.fill(color)
+    return sprite
+
+
+GHOST_SPRITES = {color: _ghost_sprite(color) for color in (RED, PINK, CYAN, ORANGE, BLUE)}
+PAC_SPRITE = pygame.Surface((CELL_SIZE, CELL_SIZE), pygame.SRCALPHA)
+pygame.draw.circle(PAC_SPRITE, YELLOW, (CELL_SIZE // 2, CELL_SIZE // 2), CELL_SIZE // 2)
+
 
 # Game classes
 class PacMan:
@@ -45,12 +62,12 @@ class PacMan:
     def move(self, dx, dy):
         new_x = self.x + dx
         new_y = self.y + dy
-        if 0 <= new_x < len(maze[0]) and 0 <= new_y < len(maze) and maze[new_y][new_x] == 0:
+        if 0 <= new_x < W and 0 <= new_y < H and MAZE_FLAT[new_y * W + new_x] == 0:
             self.x = new_x
             self.y = new_y
 
     def draw(self, screen):
-        pygame.draw.circle(screen, YELLOW, (self.x * CELL_SIZE + CELL_SIZE // 2, self.y * CELL_SIZE + CELL_SIZE // 2), CELL_SIZE // 2)
+        screen.blit(PAC_SPRITE, (self.x * CELL_SIZE, self.y * CELL_SIZE))
 
 
 class Ghost:
@@ -64,27 +81,21 @@ class Ghost:
     def move(self):
         # Simple AI for Blinky (moves towards Pac-Man)
         if not self.frightened:
-            dx, dy = 0, 0
-            if pacman.x > self.x:
-                dx = 1
-            elif pacman.x < self.x:
-                dx = -1
-            if pacman.y > self.y:
-                dy = 1
-            elif pacman.y < self.y:
-                dy = -1
+            # Sign of the distance to Pac-Man on each axis (-1, 0 or 1)
+            dx = (pacman.x > self.x) - (pacman.x < self.x)
+            dy = (pacman.y > self.y) - (pacman.y < self.y)
             self.move_safe(dx, dy)
 
     def move_safe(self, dx, dy):
         new_x = self.x + dx
         new_y = self.y + dy
-        if 0 <= new_x < len(maze[0]) and 0 <= new_y < len(maze) and maze[new_y][new_x] == 0:
+        if 0 <= new_x < W and 0 <= new_y < H and MAZE_FLAT[new_y * W + new_x] == 0:
             self.x = new_x
             self.y = new_y
 
     def draw(self, screen):
-        color = BLUE if self.frightened else self.color
-        pygame.draw.rect(screen, color, (self.x * CELL_SIZE, self.y * CELL_SIZE, CELL_SIZE, CELL_SIZE))
+        sprite = GHOST_SPRITES[BLUE if self.frightened else self.color]
+        screen.blit(sprite, (self.x * CELL_SIZE, self.y * CELL_SIZE))
 
 
 # Game initialization
@@ -100,31 +111,59 @@ ghosts = [
     Ghost(ORANGE, 12, 12),
 ]
 
-pellets = []
-power_pellets = [(0, 0), (0, len(maze) -1), (len(maze[0])-1, 0), (len(maze[0])-1, len(maze)-1)] #Four corners
+# Walls never change, so draw them once onto a surface that is blitted every frame
+wall_rects = [
+    pygame.Rect(i % W * CELL_SIZE, i // W * CELL_SIZE, CELL_SIZE, CELL_SIZE)
+    for i, v in enumerate(MAZE_FLAT)
+    if v == 1
+]
+maze_surface = pygame.Surface((WIDTH, HEIGHT)).convert()
+maze_surface.fill(BLACK)
+for rect in wall_rects:
+    pygame.draw.rect(maze_surface, WHITE, rect)
+
+pellets = set()
+power_pellets = {(0, 0), (0, H -1), (W-1, 0), (W-1, H-1)} #Four corners
 
-for y in range(len(maze)):
-    for x in range(len(maze[0])):
-        if maze[y][x] == 0:
-            pellets.append((x, y))
+for i, v in enumerate(MAZE_FLAT):
+    if v == 0:
+        pellets.add((i % W, i // W))
 
+# Pellet sprites are drawn once and blitted in a single batch each frame
+pellet_sprite = pygame.Surface((6, 6), pygame.SRCALPHA)
+pygame.draw.circle(pellet_sprite, WHITE, (3, 3), 3)
+power_sprite = pygame.Surface((16, 16), pygame.SRCALPHA)
+pygame.draw.circle(power_sprite, WHITE, (8, 8), 8)
+
+
+def build_pellet_blits():
+    """Blit sequence for the remaining pellets; rebuilt only when one is eaten"""
+    blits = [(pellet_sprite, (x * CELL_SIZE + CELL_SIZE // 2 - 3, y * CELL_SIZE + CELL_SIZE // 2 - 3)) for x, y in pellets]
+    blits += [(power_sprite, (x * CELL_SIZE + CELL_SIZE // 2 - 8, y * CELL_SIZE + CELL_SIZE // 2 - 8)) for x, y in power_pellets]
+    return blits
+
+
+pellet_blits = build_pellet_blits()
+
+
+# HUD text only changes when the score or lives do, so rendered surfaces are reused
+font = pygame.font.Font(None, 36)
+hud_cache = OrderedDict()
+HUD_CACHE_SIZE = 64
 
 # Game loop
 running = True
 while running:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
+    # Only QUIT is handled; clearing the other events keeps the queue from filling up
+    if pygame.event.peek(pygame.QUIT):
+        running = False
+    pygame.event.clear()
 
     keys = pygame.key.get_pressed()
-    if keys[pygame.K_LEFT]:
-        pacman.move(-1, 0)
-    if keys[pygame.K_RIGHT]:
-        pacman.move(1, 0)
-    if keys[pygame.K_UP]:
-        pacman.move(0, -1)
-    if keys[pygame.K_DOWN]:
-        pacman.move(0, 1)
+    dx = keys[pygame.K_RIGHT] - keys[pygame.K_LEFT]
+    dy = keys[pygame.K_DOWN] - keys[pygame.K_UP]
+    if dx or dy:
+        pacman.move(dx, dy)
 
 
     #Ghost Movement
@@ -139,45 +178,41 @@ while running:
                 running = False
 
     #Pellet and Power Pellet Consumption
-    for i in range(len(pellets) - 1, -1, -1):
-        pellet_x, pellet_y = pellets[i]
-        if pacman.x == pellet_x and pacman.y == pellet_y:
-            pacman.score += 10
-            del pellets[i]
-
-    for i in range(len(power_pellets) - 1, -1, -1):
-        pellet_x, pellet_y = power_pellets[i]
-        if pacman.x == pellet_x and pacman.y == pellet_y:
-            pacman.score += 50
-            del power_pellets[i]
-            for ghost in ghosts:
-                ghost.frightened = True
-                ghost.frightened_timer = pygame.time.get_ticks()
+    position = (pacman.x, pacman.y)
+    if position in pellets:
+        pacman.score += 10
+        pellets.discard(position)
+        pellet_blits = build_pellet_blits()
+
+    if position in power_pellets:
+        pacman.score += 50
+        power_pellets.discard(position)
+        pellet_blits = build_pellet_blits()
+        for ghost in ghosts:
+            ghost.frightened = True
+            ghost.frightened_timer = pygame.time.get_ticks()
 
 
     #Warp Tunnels
     if pacman.x == -1:
-        pacman.x = len(maze[0]) -1
-    if pacman.x == len(maze[0]):
+        pacman.x = W -1
+    if pacman.x == W:
         pacman.x = 0
 
 
     #Drawing
-    screen.fill(BLACK)
-    for y in range(len(maze)):
-        for x in range(len(maze[0])):
-            if maze[y][x] == 1:
-                pygame.draw.rect(screen, WHITE, (x * CELL_SIZE, y * CELL_SIZE, CELL_SIZE, CELL_SIZE))
-    for pellet_x, pellet_y in pellets:
-        pygame.draw.circle(screen, WHITE, (pellet_x * CELL_SIZE + CELL_SIZE // 2, pellet_y * CELL_SIZE + CELL_SIZE // 2), 3)
-    for pellet_x, pellet_y in power_pellets:
-        pygame.draw.circle(screen, WHITE, (pellet_x * CELL_SIZE + CELL_SIZE // 2, pellet_y * CELL_SIZE + CELL_SIZE // 2), 8)
+    screen.blit(maze_surface, (0, 0))
+    screen.blits(pellet_blits, doreturn=False)
     pacman.draw(screen)
     for ghost in ghosts:
         ghost.draw(screen)
-    font = pygame.font.Font(None, 36)
-    score_text = font.render(f"Score: {pacman.score}", True, WHITE)
-    lives_text = font.render(f"Lives: {pacman.lives}", True, WHITE)
+    hud_key = (pacman.score, pacman.lives)
+    if hud_key not in hud_cache:
+        hud_cache[hud_key] = (font.render(f"Score: {pacman.score}", True, WHITE),
+                              font.render(f"Lives: {pacman.lives}", True, WHITE))
+        if len(hud_cache) > HUD_CACHE_SIZE:
+            hud_cache.popitem(last=False)
+    score_text, lives_text = hud_cache[hud_key]
     screen.blit(score_text, (10, 10))
     screen.blit(lives_text, (10, 50))
 
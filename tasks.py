@@ -1,56 +1,81 @@
-from crewai import Task
 from textwrap import dedent
 
+# Shared opening of every task description; keeping it identical lets the
+# repeated prefix be served from Gemini's implicit prompt cache
+_INSTRUCTION_HEADER = dedent("""
+    You are helping create a game using python.
+    IMPORTANT: Keep your response concise to reduce API usage.
+""")
+
+# Review and evaluation work from the generated code, so they only need the gist
+_SUMMARY_CHARS = 300
+
+
+def _summarize(game_instructions):
+    """Collapse whitespace and cut the instructions at a word boundary"""
+    text = " ".join(game_instructions.split())
+    if len(text) <= _SUMMARY_CHARS:
+        return text
+    return text[:_SUMMARY_CHARS].rsplit(" ", 1)[0] + "..."
+
+
 class GameBuilderTasks:
     def code_task(self, agent, game_instructions):
+        from crewai import Task
         return Task(
-            description=dedent(f"""
-                You will create a game using python, these are the instructions:
+            description=_INSTRUCTION_HEADER + dedent(f"""
+                Focus on creating functional, working code without excessive comments.
+                
+                These are the instructions:
                 Instructions
                 ------------
                 {game_instructions}
-                
-                IMPORTANT: Keep your response concise to reduce API usage.
-                Focus on creating functional, working code without excessive comments.
+                ------------
             """),
             expected_output="Your Final answer must be the full python code, only the python code and nothing else.",
             agent=agent
         )
 
-    def review_task(self, agent, game_instructions):
+    def review_task(self, agent, game_instructions, context=None, async_execution=False):
+        from crewai import Task
         return Task(
-            description=dedent(f"""
-                You will create a game using python, these are the instructions:
-                Instructions
-                ------------
-                {game_instructions}
-                
+            description=_INSTRUCTION_HEADER + dedent(f"""
                 Using the code you got, check for errors. Check for logic errors,
                 syntax errors, missing imports, variable declarations, mismatched brackets,
                 and security vulnerabilities.
                 
                 IMPORTANT: Only fix actual errors. Do not make unnecessary changes.
-                Keep your response concise to reduce API usage.
+                
+                These are the instructions (summarized):
+                Instructions
+                ------------
+                {_summarize(game_instructions)}
+                ------------
             """),
             expected_output="Your Final answer must be the full python code, only the python code and nothing else.",
-            agent=agent
+            agent=agent,
+            context=context,
+            async_execution=async_execution
         )
 
-    def evaluate_task(self, agent, game_instructions):
+    def evaluate_task(self, agent, game_instructions, context=None, async_execution=False):
+        from crewai import Task
         return Task(
-            description=dedent(f"""
-                You are helping create a game using python, these are the instructions:
-                Instructions
-                ------------
-                {game_instructions}
-                
+            description=_INSTRUCTION_HEADER + dedent(f"""
                 You will look over the code to insure that it is complete and
                 does the job that it is supposed to do.
                 
                 IMPORTANT: Only make changes if absolutely necessary for functionality.
-                Keep your response concise to reduce API usage.
                 The code should be working and complete.
+                
+                These are the instructions (summarized):
+                Instructions
+                ------------
+                {_summarize(game_instructions)}
+                ------------
             """),
             expected_output="Your Final answer must be the full python code, only the python code and nothing else.",
-            agent=agent
+            agent=agent,
+            context=context,
+            async_execution=async_execution
         )
\ No newline at end of file
@@ -1,7 +1,101 @@
 from crewai_tools import tool
-import subprocess
-import tempfile
-import os
+import re
+import ast
+import json
+
+
+def _validate_code(code):
+    """Check code for syntax errors and return a report string"""
+    try:
+        # Compile in memory; nothing is executed or written to disk
+        compile(code, "<submitted>", "exec")
+        return "Code validation successful: No syntax errors found."
+        
+    except SyntaxError as e:
+        return f"Syntax Error found: {str(e)}"
+    except Exception as e:
+        return f"Error during validation: {str(e)}"
+
+
+_DANGEROUS_FUNCTIONS = ('eval', 'exec', 'input', '__import__', 'open')
+
+# Fallback for code that does not parse: a single pass over the source text
+_DANGEROUS_RE = re.compile(r"\b(eval|exec|input|__import__|open)\s*\(|\b(subprocess|os\.system)\b")
+
+
+def _opens_for_write(call):
+    """Return True if an open() call may write (a non-literal mode counts as writing)"""
+    mode = call.args[1] if len(call.args) > 1 else None
+    for keyword in call.keywords:
+        if keyword.arg == 'mode':
+            mode = keyword.value
+    if mode is None:
+        return False
+    if isinstance(mode, ast.Constant) and isinstance(mode.value, str):
+        return any(flag in mode.value for flag in 'wax+')
+    return True
+
+
+def _find_issues(code):
+    """Return (dangerous function names, shell execution, file writes) found in code"""
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        functions, shell = set(), False
+        for function, module in _DANGEROUS_RE.findall(code):
+            if function:
+                functions.add(function)
+            shell = shell or bool(module)
+        writes = 'open' in functions and ('w' in code or 'a' in code)
+        return functions, shell, writes
+    
+    # Only real calls and imports count, not names inside strings or comments
+    functions, shell, writes = set(), False, False
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+            if node.func.id in _DANGEROUS_FUNCTIONS:
+                functions.add(node.func.id)
+                writes = writes or (node.func.id == 'open' and _opens_for_write(node))
+        elif isinstance(node, ast.Import):
+            shell = shell or any(alias.name.split('.')[0] == 'subprocess' for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            shell = shell or (node.module or '').split('.')[0] == 'subprocess'
+        elif isinstance(node, ast.Attribute):
+            shell = shell or (node.attr == 'system' and isinstance(node.value, ast.Name) and node.value.id == 'os')
+    return functions, shell, writes
+
+
+def _scan_code(code):
+    """Scan code for potentially dangerous constructs and return a report string"""
+    functions, shell, writes = _find_issues(code)
+    security_issues = []
+    
+    # Check for dangerous functions
+    for func in _DANGEROUS_FUNCTIONS:
+        if func in functions:
+            security_issues.append(f"Potentially dangerous function '{func}' found")
+    
+    # Check for shell commands
+    if shell:
+        security_issues.append("Shell command execution detected")
+    
+    # Check for file operations
+    if writes:
+        security_issues.append("File write operations detected")
+    
+    if security_issues:
+        return "Security issues found: " + "; ".join(security_issues)
+    else:
+        return "No obvious security issues detected."
+
+
+def review_report(code):
+    """Run the syntax check and the security scan and return both as a JSON report"""
+    return json.dumps({
+        'validation': _validate_code(code),
+        'security': _scan_code(code)
+    })
+
 
 class GameBuilderTools:
     
@@ -10,54 +104,20 @@ class GameBuilderTools:
         """
         Validates Python code for syntax errors and basic issues.
         """
-        try:
-            # Create a temporary file to test the code
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as temp_file:
-                temp_file.write(code)
-                temp_file_path = temp_file.name
-            
-            # Try to compile the code
-            with open(temp_file_path, 'r') as f:
-                compile(f.read(), temp_file_path, 'exec')
-            
-            # Clean up
-            os.unlink(temp_file_path)
-            
-            return "Code validation successful: No syntax errors found."
-            
-        except SyntaxError as e:
-            # Clean up
-            if 'temp_file_path' in locals():
-                os.unlink(temp_file_path)
-            return f"Syntax Error found: {str(e)}"
-        except Exception as e:
-            # Clean up
-            if 'temp_file_path' in locals():
-                os.unlink(temp_file_path)
-            return f"Error during validation: {str(e)}"
+        return _validate_code(code)
     
     @tool("Code Security Scanner")
     def scan_security_issues(self, code: str) -> str:
         """
         Scans Python code for potential security vulnerabilities.
         """
-        security_issues = []
-        
-        # Check for dangerous functions
-        dangerous_functions = ['eval', 'exec', 'input', '__import__', 'open']
-        for func in dangerous_functions:
-            if func + '(' in code:
-                security_issues.append(f"Potentially dangerous function '{func}' found")
-        
-        # Check for shell commands
-        if 'subprocess' in code or 'os.system' in code:
-            security_issues.append("Shell command execution detected")
-        
-        # Check for file operations
-        if 'open(' in code and ('w' in code or 'a' in code):
-            security_issues.append("File write operations detected")
-        
-        if security_issues:
-            return "Security issues found: " + "; ".join(security_issues)
-        else:
-            return "No obvious security issues detected."
\ No newline at end of file
+        return _scan_code(code)
+    
+    @tool("Code Review")
+    def combined_code_review(self, code: str) -> str:
+        """
+        Validates Python code for syntax errors and scans it for security
+        vulnerabilities in one call. Returns JSON with 'validation' and
+        'security' results.
+        """
+        return review_report(code)
\ No newline at end of file